@@ -1,13 +1,14 @@
 # compute_srs.py
 import os
-from datetime import datetime, timezone
+import zlib
+from functools import lru_cache
+from datetime import date, datetime, timedelta, timezone
 from typing import List, Tuple, Optional
-from sqlalchemy import text
 
 try:
     from .db import get_engine
 except ImportError:
-    from db import get_engine
+    from src.db import get_engine   # imported top-level by update.py (repo root on sys.path)
 # ---------------- env helpers ----------------
 def _env_bool(name: str, default: bool) -> bool:
     v = os.getenv(name, str(default)).lower()
@@ -17,13 +18,13 @@ def _env_str(name: str, default: str) -> str:
     v = os.getenv(name)
     return v if v not in (None, "") else default
 
-def _parse_cadence(s: str, fallback: List[int]) -> List[int]:
+def _parse_cadence(s: str, fallback: List[int]) -> Tuple[int, ...]:
     out: List[int] = []
     for part in (s or "").split(","):
         part = part.strip()
         if part.isdigit():
             out.append(int(part))
-    return out or fallback
+    return tuple(out or fallback)  # immutable/hashable
 
 # --------------- config ----------------
 TRACK_WINS      = _env_bool("SRS_TRACK_WINS", False)  # <-- key switch
@@ -42,23 +43,44 @@ def _env_int(name: str, default: int) -> int:
 
 STAGGER_BUCKETS  = _env_int("SRS_STAGGER_BUCKETS", 7)
 # --------------- SQL ----------------
-SQL_LAST_ATTEMPT = text("""
-SELECT a.puzzle_id,
-       MAX(a.attempted_at) AS last_attempt,
-       (SELECT result FROM attempts a2
-         WHERE a2.user_id=1 AND a2.puzzle_id=a.puzzle_id
-         ORDER BY a2.attempted_at DESC LIMIT 1) AS last_result
+# Plain sqlite3 SQL: run() works on the DBAPI connection directly.
+# latest attempt per puzzle in one pass (window over idx_attempts_user_puzzle_time),
+# joined to its current SRS row (PK lookup); result/streak come back normalized
+LAST_ATTEMPT_TPL = """
+SELECT t.puzzle_id, t.attempted_at AS last_attempt,
+       date(t.attempted_at, 'localtime') AS last_attempt_local,
+       COALESCE(LOWER(t.result), 'loss') AS last_result,
+       COALESCE(LOWER(t.result), 'loss') = 'win' AS is_win,
+       s.puzzle_id IS NOT NULL AS has_srs,
+       COALESCE(s.success_streak, 0) AS success_streak
+FROM (
+  SELECT a.puzzle_id, a.attempted_at, a.result,
+         ROW_NUMBER() OVER (PARTITION BY a.puzzle_id ORDER BY a.attempted_at DESC) AS rn
+  FROM attempts a
+  WHERE a.user_id=1{where}
+) t
+LEFT JOIN srs s ON s.user_id=1 AND s.puzzle_id=t.puzzle_id
+WHERE t.rn=1
+"""
+SQL_LAST_ATTEMPT = LAST_ATTEMPT_TPL.format(where="")
+
+# The /log path recomputes one puzzle: same columns, but the newest attempt
+# is the first row of an index seek (no window/partition pass)
+SQL_LAST_ATTEMPT_ONE = """
+SELECT a.puzzle_id, a.attempted_at AS last_attempt,
+       date(a.attempted_at, 'localtime') AS last_attempt_local,
+       COALESCE(LOWER(a.result), 'loss') AS last_result,
+       COALESCE(LOWER(a.result), 'loss') = 'win' AS is_win,
+       s.puzzle_id IS NOT NULL AS has_srs,
+       COALESCE(s.success_streak, 0) AS success_streak
 FROM attempts a
-WHERE a.user_id=1
-GROUP BY a.puzzle_id
-""")
+LEFT JOIN srs s ON s.user_id=1 AND s.puzzle_id=a.puzzle_id
+WHERE a.user_id=1 AND a.puzzle_id=?
+ORDER BY a.attempted_at DESC
+LIMIT 1
+"""
 
-SQL_GET_EXISTING = text("""
-SELECT puzzle_id, success_streak, interval_days, last_result, last_reviewed, due_date
-FROM srs WHERE user_id=1 AND puzzle_id=:pid
-""")
-
-SQL_UPSERT_SRS = text("""
+SQL_UPSERT_SRS = """
 INSERT INTO srs (user_id, puzzle_id, last_result, success_streak, interval_days, due_date, last_reviewed)
 VALUES (1, :puzzle_id, :last_result, :streak, :interval_days, :due_date, :last_reviewed)
 ON CONFLICT(user_id, puzzle_id) DO UPDATE SET
@@ -67,35 +89,46 @@ ON CONFLICT(user_id, puzzle_id) DO UPDATE SET
   interval_days  = excluded.interval_days,
   due_date       = excluded.due_date,
   last_reviewed  = excluded.last_reviewed
-""")
+"""
+
+DELETE_SRS_TPL = "DELETE FROM srs WHERE user_id=1 AND puzzle_id IN ({marks})"
+
+WRITE_BATCH = 1000  # rows per executemany chunk
+IN_LIST_MAX = 900   # stay under SQLITE_MAX_VARIABLE_NUMBER on older builds (999)
 
-SQL_DELETE_SRS = text("DELETE FROM srs WHERE user_id=1 AND puzzle_id=:pid")
+def _in_marks(n: int) -> str:
+    return ",".join("?" * n)
 
 # --------------- helpers ----------------
 def _local_date_of_iso(iso_ts: str) -> str:
-    dt = datetime.fromisoformat(iso_ts.replace("Z","+00:00"))
+    # attempted_at is ISO-8601 with "Z" or "+00:00" (fromisoformat takes both on 3.11+)
+    dt = datetime.fromisoformat(iso_ts)
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone().strftime("%Y-%m-%d")
+    # astimezone() without a tz on purpose: a cached offset would be wrong across DST
+    return dt.astimezone().date().isoformat()
+
+# Precomputed once; the cadences are fixed for the life of the process.
+_LOSS_LAST = len(LOSS_CADENCE) - 1
+_WIN_LAST  = len(WIN_CADENCE) - 1
 
 def _next_interval_days(streak: int, for_win: bool) -> int:
-    cad = WIN_CADENCE if (for_win and TRACK_WINS) else LOSS_CADENCE
-    idx = min(max(streak,1) - 1, len(cad)-1)
-    return cad[idx]
+    if for_win and TRACK_WINS:
+        return WIN_CADENCE[min(max(streak,1) - 1, _WIN_LAST)]
+    return LOSS_CADENCE[min(max(streak,1) - 1, _LOSS_LAST)]
 
+@lru_cache(maxsize=None)
 def _seed_offset_days(puzzle_id: str) -> int:
-    if SEED_MODE == "stagger":
-        base = 0
-        for ch in puzzle_id:
-            base = (base * 131 + ord(ch)) & 0x7fffffff
-        return (base % max(STAGGER_BUCKETS,1)) or 1
-    return 1  # tomorrow
-
-def _calc_update(existing: Optional[dict], last_result: str, last_attempt_local_date: str, puzzle_id: str):
-    """Return (streak, interval_days, base_date, plus_expr, for_win)"""
-    is_win = (last_result == "win")
-    if existing:
-        streak = existing["success_streak"] or 0
+    if SEED_MODE != "stagger":
+        return 1  # tomorrow
+    base = zlib.crc32(puzzle_id.encode("utf-8")) & 0x7fffffff
+    return (base % max(STAGGER_BUCKETS,1)) or 1
+
+def _calc_update(existing_streak: Optional[int], is_win: bool, last_attempt_local_date: str, puzzle_id: str):
+    """existing_streak is None when there is no SRS row yet.
+    Return (streak, interval_days, base_date, plus_expr, for_win)"""
+    if existing_streak is not None:
+        streak = existing_streak
         if is_win:
             # won last attempt
             if TRACK_WINS:
@@ -119,43 +152,66 @@ def _calc_update(existing: Optional[dict], last_result: str, last_attempt_local_
         return (streak, interval, last_attempt_local_date, f"+{interval} day", is_win)
 
 # --------------- main ----------------
-def run(engine=None, changed_pids: Optional[list]=None):
+def run(engine=None, changed_pids: Optional[list]=None, bulk: bool=False):
     """
     Recompute/seed SRS schedule.
     Accepts optional changed_pids for compatibility with update.py.
+    The work runs on the raw sqlite3 connection behind the engine (PRAGMAs
+    from the engine's connect hook still apply), in one BEGIN IMMEDIATE
+    transaction. bulk=True on a full rebuild drops fsyncs (synchronous=OFF)
+    for its duration; the table is re-derivable from attempts.
     """
     eng = engine or get_engine(os.getenv("DB_PATH", "./db/lichess_puzzles.sqlite3"))
+    pending: List[dict] = []
+    to_delete: List[str] = []
     updated = 0
-    deleted = 0
+    bulk = bulk and changed_pids is None
 
-    with eng.begin() as conn:
-        rows = conn.execute(SQL_LAST_ATTEMPT).mappings().all()
-        for r in rows:
-            pid = r["puzzle_id"]
-            if changed_pids is not None and pid not in changed_pids:
-                continue
+    raw = eng.raw_connection()
+    try:
+        cur = raw.cursor()
+        if bulk:
+            # journal_mode stays WAL: leaving it needs exclusive access and
+            # serve.py may hold connections open.
+            cur.execute("PRAGMA synchronous=OFF")
+        cur.execute("BEGIN IMMEDIATE")  # take the write lock up front
+        if changed_pids is not None and len(changed_pids) > IN_LIST_MAX:
+            # too many for bound parameters: scan everything, filter in Python
+            changed = frozenset(changed_pids)
+            rows = (r for r in cur.execute(SQL_LAST_ATTEMPT) if r[0] in changed)
+        elif changed_pids is None:
+            rows = cur.execute(SQL_LAST_ATTEMPT)
+        elif len(set(changed_pids)) == 1:
+            rows = cur.execute(SQL_LAST_ATTEMPT_ONE, (next(iter(changed_pids)),))
+        else:
+            pids = list(frozenset(changed_pids))
+            where = f" AND a.puzzle_id IN ({_in_marks(len(pids))})"
+            rows = cur.execute(LAST_ATTEMPT_TPL.format(where=where), pids)
 
-            last_result = (r["last_result"] or "loss").lower()
-            last_attempt_date = _local_date_of_iso(r["last_attempt"])
-            existing = conn.execute(SQL_GET_EXISTING, {"pid": pid}).mappings().first()
+        # Rows are streamed off the read cursor and upserts are flushed every
+        # WRITE_BATCH on a second cursor, so memory stays O(batch). Each write
+        # only touches a puzzle already read, so the open SELECT is unaffected.
+        wcur = raw.cursor()
 
+        for pid, last_attempt, last_attempt_date, last_result, is_win, has_srs, srs_streak in rows:
             # If we don't track wins and latest result is win: remove existing row if any.
-            if last_result == "win" and not TRACK_WINS:
-                if existing:
-                    conn.execute(SQL_DELETE_SRS, {"pid": pid})
-                    deleted += 1
+            if is_win and not TRACK_WINS:
+                if has_srs:
+                    to_delete.append(pid)
                 continue
+            if last_attempt_date is None:
+                # SQLite couldn't parse the timestamp; fall back to Python
+                last_attempt_date = _local_date_of_iso(last_attempt)
 
-            res = _calc_update(existing, last_result, last_attempt_date, pid)
+            res = _calc_update(srs_streak if has_srs else None, is_win, last_attempt_date, pid)
             if res is None:
                 # means: latest is win and TRACK_WINS=false (handled above), or other non-trackables
                 continue
 
             streak, interval, base_date, plus, is_win = res
-            due_val = conn.execute(text("SELECT date(:base, :plus) AS d"),
-                                   {"base": base_date, "plus": plus}).mappings().one()["d"]
+            due_val = (date.fromisoformat(base_date) + timedelta(days=interval)).isoformat()
 
-            conn.execute(SQL_UPSERT_SRS, {
+            pending.append({
                 "puzzle_id": pid,
                 "last_result": last_result,
                 "streak": streak,
@@ -163,9 +219,28 @@ def run(engine=None, changed_pids: Optional[list]=None):
                 "due_date": due_val,
                 "last_reviewed": base_date
             })
-            updated += 1
-
-    print(f"[compute_srs] Updated SRS for {updated} puzzles. Removed {deleted} non-tracked rows.")
+            if len(pending) >= WRITE_BATCH:
+                wcur.executemany(SQL_UPSERT_SRS, pending)
+                updated += len(pending)
+                pending.clear()
+
+        # remaining writes, same transaction
+        if pending:
+            wcur.executemany(SQL_UPSERT_SRS, pending)
+            updated += len(pending)
+        for i in range(0, len(to_delete), IN_LIST_MAX):
+            chunk = to_delete[i:i + IN_LIST_MAX]
+            wcur.execute(DELETE_SRS_TPL.format(marks=_in_marks(len(chunk))), chunk)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        if bulk:
+            raw.cursor().execute("PRAGMA synchronous=NORMAL")
+        raw.close()  # returns the connection to the pool
+
+    print(f"[compute_srs] Updated SRS for {updated} puzzles. Removed {len(to_delete)} non-tracked rows.")
 
 if __name__ == "__main__":
     run()
@@ -1,6 +1,7 @@
 # src/config.py
 from __future__ import annotations
 import os
+from functools import lru_cache
 from pathlib import Path
 
 # Load .env if present (optional dependency)
@@ -40,9 +41,11 @@ def _env_csv_int(name: str, default: list[int]) -> list[int]:
 # ---------------- Core paths ----------------
 DB_PATH = _env_str("DB_PATH", "./db/lichess_puzzles.sqlite3")
 
+@lru_cache(maxsize=1)
 def get_db_path() -> str:
     """
     Return the DB path, making it absolute if it’s relative to project ROOT.
+    Cached: resolve() stats every path component and DB_PATH is fixed at import.
     """
     p = DB_PATH
     if not p.startswith("/"):
@@ -1,31 +1,60 @@
 # src/db.py
 from __future__ import annotations
-import sqlite3
-from contextlib import contextmanager
-from sqlalchemy import create_engine
+import threading
+from pathlib import Path
+from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
 from .config import get_db_path
 
 # SQLAlchemy engine (used by compute_srs.py or anything needing SQLAlchemy)
 _engine: Engine | None = None
+_engine_lock = threading.Lock()   # serve.py threads may race the first get_engine()
+
+# Stamped on every physical connection: apart from journal_mode these are
+# per-connection and would otherwise silently reset on new pooled connections.
+# (foreign_keys stays off: attempts may reference puzzles not yet synced.)
+PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "cache_size=-64000",      # 64 MB page cache
+    "temp_store=MEMORY",
+    "mmap_size=268435456",    # 256 MB
+    "busy_timeout=5000",
+)
+
+def _set_sqlite_pragmas(dbapi_conn, _record) -> None:
+    cur = dbapi_conn.cursor()
+    for p in PRAGMAS:
+        cur.execute(f"PRAGMA {p}")
+    cur.close()
 
 def get_engine(db_path: str | None = None) -> Engine:
     global _engine
     if _engine is None:
-        path = db_path or get_db_path()
-        _engine = create_engine(
-            f"sqlite:///{path}",
-            future=True,
-            echo=False,
-            connect_args={"check_same_thread": False},
-        )
+        with _engine_lock:
+            if _engine is None:
+                path = db_path or get_db_path()
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                # File DBs get a QueuePool, for which pysqlite already disables
+                # check_same_thread; the pool hands a connection to one thread at a time.
+                eng = create_engine(
+                    f"sqlite:///{path}",
+                    future=True,
+                    echo=False,
+                    query_cache_size=1200,   # room for every module-level text() query
+                )
+                event.listen(eng, "connect", _set_sqlite_pragmas)
+                _engine = eng   # publish only once the hook is attached
     return _engine
 
-# Lightweight sqlite3 helper for simple local queries in serve.py
-@contextmanager
-def open_sqlite():
-    conn = sqlite3.connect(get_db_path())
+def init_db(db_path: str | None = None, schema_path: str | None = None) -> None:
+    """Apply schema.sql on the shared engine (PRAGMAs come from the connect hook)."""
+    eng = get_engine(db_path)
+    schema = Path(schema_path) if schema_path else Path(__file__).with_name("schema.sql")
+    raw = eng.raw_connection()
     try:
-        yield conn
+        # one parse pass; copes with comments/triggers that ";\n" splitting breaks
+        raw.cursor().executescript(schema.read_text(encoding="utf-8"))
+        raw.commit()
     finally:
-        conn.close()
+        raw.close()
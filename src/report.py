@@ -1,18 +1,51 @@
 # src/report.py
+import gzip
+import json
 import os
 import re
-from collections import Counter
+import shutil
+from contextlib import contextmanager
 from datetime import date, datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 
 from sqlalchemy import text
 
+try:
+    import orjson   # listed in requirements.txt; the stdlib json path is the fallback
+except ImportError:
+    orjson = None
+
 # ─────────────────────────────────────────────────────────────────────────────
 # [RP-1] Overview / Index / Archive helpers
 # ─────────────────────────────────────────────────────────────────────────────
 
 DATE_HTML_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.html$")
 
+@contextmanager
+def _atomic_write(path: Path, buffering: int = -1):
+    """Binary file on a sibling .tmp that replaces path only once fully written,
+    so an interrupted run never leaves a half-written page behind."""
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp, "wb", buffering=buffering) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+def _write_if_changed(path: Path, data: bytes) -> bool:
+    """Write data unless the file already holds exactly these bytes; True if written."""
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    with _atomic_write(path) as f:
+        f.write(data)
+    return True
+
 def _write_overview_index_archive(docs_dir: Path, today_html: Path, report_date_str: str) -> None:
     """
     Writes:
@@ -22,11 +55,12 @@ def _write_overview_index_archive(docs_dir: Path, today_html: Path, report_date_
     """
     docs_dir.mkdir(parents=True, exist_ok=True)
 
-    # 1) overview.html = copy of the tracker (lifetime overview)
+    # 1) overview.html = copy of the tracker (lifetime overview); byte copy,
+    #    the page is never decoded into a str
     index_html_path = docs_dir / "index.html"
     if index_html_path.exists():
-        overview_html = index_html_path.read_text(encoding="utf-8")
-        (docs_dir / "overview.html").write_text(overview_html, encoding="utf-8")
+        with _atomic_write(docs_dir / "overview.html") as f, index_html_path.open("rb") as src:
+            shutil.copyfileobj(src, f)
 
     # 2) gather all YYYY-MM-DD.html for archive
     dates: list[str] = []
@@ -53,7 +87,7 @@ def _write_overview_index_archive(docs_dir: Path, today_html: Path, report_date_
 {lis}
 </ol>
 """
-    (docs_dir / "archive.html").write_text(archive_html, encoding="utf-8")
+    _write_if_changed(docs_dir / "archive.html", archive_html.encode("utf-8"))
 
 # ─────────────────────────────────────────────────────────────────────────────
 # [RP-2] Config
@@ -63,46 +97,57 @@ THEME_COUNT = 4  # show up to N themes per row in tables
 QUEUE_PERSIST = os.getenv("REPORT_QUEUE_PERSIST", "true").lower() in ("1","true","yes","on")
 INCLUDE_OVERDUE = os.getenv("INCLUDE_OVERDUE", "false").lower() in ("1","true","yes","on")
 PAGE_SIZE = int(os.getenv("REPORT_PAGE_SIZE", "10"))  # default rows per page (consistent size)
+WRITE_BUFFER = 1 << 20  # pages are streamed to disk section by section
+GZIP_LEVEL = 6          # index.html.gz is written alongside index.html
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # [RP-3] SQL
 # ─────────────────────────────────────────────────────────────────────────────
 
+# all-time, 7-day and 30-day KPIs from one scan of the user's attempts
+# (AVG skips the NULLs outside each window, so an empty window stays NULL)
 KPI = text("""
 SELECT COUNT(*) AS attempts,
-       ROUND(100.0*AVG(CASE WHEN result='win' THEN 1.0 ELSE 0.0 END),1) AS acc
+       ROUND(100.0*AVG(CASE WHEN result='win' THEN 1.0 ELSE 0.0 END),1) AS acc,
+       ROUND(100.0*AVG(CASE WHEN attempted_at >= datetime('now','-7 day')
+                            THEN CASE WHEN result='win' THEN 1.0 ELSE 0.0 END END),1) AS acc7,
+       ROUND(100.0*AVG(CASE WHEN attempted_at >= datetime('now','-30 day')
+                            THEN CASE WHEN result='win' THEN 1.0 ELSE 0.0 END END),1) AS acc30
 FROM attempts WHERE user_id=1
 """)
 
-KPI7  = text("""
-SELECT ROUND(100.0*AVG(CASE WHEN result='win' THEN 1.0 ELSE 0.0 END),1) AS acc7
-FROM attempts WHERE user_id=1 AND attempted_at >= datetime('now','-7 day')
-""")
-
-KPI30 = text("""
-SELECT ROUND(100.0*AVG(CASE WHEN result='win' THEN 1.0 ELSE 0.0 END),1) AS acc30
-FROM attempts WHERE user_id=1 AND attempted_at >= datetime('now','-30 day')
-""")
-
+# per-puzzle attempt totals come from one grouped pass, not a subquery per row
 MISSED_30 = text("""
-SELECT a.puzzle_id, p.themes, a.attempted_at,
-       (SELECT COUNT(*) FROM attempts a2 WHERE a2.user_id=1 AND a2.puzzle_id=a.puzzle_id) AS total_attempts
+SELECT a.puzzle_id, p.themes, a.attempted_at, c.ct AS total_attempts
 FROM attempts a JOIN puzzles p ON p.puzzle_id=a.puzzle_id
+JOIN (SELECT puzzle_id, COUNT(*) AS ct FROM attempts WHERE user_id=1 GROUP BY puzzle_id) c
+  ON c.puzzle_id=a.puzzle_id
 WHERE a.user_id=1 AND a.result='loss' AND a.attempted_at >= datetime('now','-30 day')
 ORDER BY a.attempted_at DESC LIMIT 1000
 """)
 
-THEME_ROWS_90 = text("""
-SELECT p.themes AS themes_csv, a.result AS result
-FROM attempts a JOIN puzzles p ON p.puzzle_id=a.puzzle_id
-WHERE a.user_id=1 AND a.attempted_at >= datetime('now','-90 day')
-""")
-
-THEME_ROWS_ALL = text("""
-SELECT p.themes AS themes_csv, a.result AS result
-FROM attempts a JOIN puzzles p ON p.puzzle_id=a.puzzle_id
-WHERE a.user_id=1
+# per-theme totals, all-time and 90-day, aggregated in SQLite: json_each
+# splits the space/comma separated themes into one row per (attempt, theme).
+# The array is built from json_quote() of the themes (ASCII whitespace and
+# commas first folded to spaces), so quotes, backslashes or control characters
+# in a theme stay escaped; escape sequences never contain a space to split on.
+THEME_AGG = text("""
+WITH ax AS (
+  SELECT CASE WHEN a.result='win' THEN 1 ELSE 0 END AS win,
+         CASE WHEN a.attempted_at >= datetime('now','-90 day') THEN 1 ELSE 0 END AS in90,
+         p.themes
+  FROM attempts a JOIN puzzles p ON p.puzzle_id=a.puzzle_id
+  WHERE a.user_id=1
+)
+SELECT j.value AS theme, COUNT(*) AS n_all, SUM(win) AS w_all,
+       SUM(in90) AS n_90, SUM(in90*win) AS w_90
+FROM ax, json_each('[' || replace(json_quote(
+       replace(replace(replace(replace(replace(replace(ax.themes,
+         ',', ' '), char(9), ' '), char(10), ' '), char(11), ' '), char(12), ' '), char(13), ' ')
+     ), ' ', '","') || ']') j
+WHERE j.value <> ''
+GROUP BY j.value
 """)
 
 RECENT_ATTEMPTS = text("""
@@ -113,23 +158,43 @@ ORDER BY a.attempted_at DESC
 LIMIT 100
 """)
 
-# SRS queues — local-time aware
+# SRS queues — local-time aware; per-puzzle attempt stats are aggregated once
+# (agg), then one pass tags each row with its queue and keeps 2000 per queue
 DUE_TPL = """
-SELECT s.puzzle_id, p.themes, s.due_date,
-       COUNT(a.id) AS attempts, MAX(a.attempted_at) AS last_attempt
-FROM srs s
-JOIN puzzles p ON p.puzzle_id = s.puzzle_id
-LEFT JOIN attempts a ON a.user_id=1 AND a.puzzle_id=s.puzzle_id
-WHERE s.user_id=1 AND {where}
-GROUP BY s.puzzle_id, p.themes, s.due_date
-ORDER BY s.due_date, s.puzzle_id
-LIMIT 2000
+WITH agg AS (
+  SELECT puzzle_id, COUNT(*) AS n, MAX(attempted_at) AS last
+  FROM attempts WHERE user_id=1 GROUP BY puzzle_id
+)
+SELECT puzzle_id, themes, due_date, attempts, last_attempt, bucket FROM (
+  SELECT g.*, ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY due_date, puzzle_id) AS rn
+  FROM (
+    SELECT s.puzzle_id, p.themes, s.due_date,
+           COALESCE(a.n, 0) AS attempts, a.last AS last_attempt,
+           CASE WHEN s.due_date <  date('now','localtime')          THEN 'overdue'
+                WHEN s.due_date =  date('now','localtime')          THEN 'today'
+                WHEN s.due_date =  date('now','localtime','+1 day') THEN 'p1'
+                WHEN s.due_date <= date('now','localtime','+7 day') THEN 'p7'
+                ELSE 'later' END AS bucket
+    FROM srs s
+    JOIN puzzles p ON p.puzzle_id = s.puzzle_id
+    LEFT JOIN agg a ON a.puzzle_id=s.puzzle_id
+    WHERE s.user_id=1{where}
+  ) g
+)
+WHERE rn <= 2000
+ORDER BY due_date, puzzle_id
 """
-DUE_ONLY_TODAY = text(DUE_TPL.format(where="s.due_date = date('now','localtime')"))
-DUE_OVERDUE    = text(DUE_TPL.format(where="s.due_date < date('now','localtime')"))
-DUE_PLUS1      = text(DUE_TPL.format(where="s.due_date = date('now','localtime','+1 day')"))
-DUE_2_7        = text(DUE_TPL.format(where="s.due_date BETWEEN date('now','localtime','+2 day') AND date('now','localtime','+7 day')"))
-DUE_LATER      = text(DUE_TPL.format(where="s.due_date > date('now','localtime','+7 day')"))
+DUE_ALL = text(DUE_TPL.format(where="" if INCLUDE_OVERDUE else " AND s.due_date >= date('now','localtime')"))
+DUE_BUCKETS = ("overdue", "today", "p1", "p7", "later")
+
+def _fetch_all(conn, q) -> list:
+    return conn.execute(q).all()
+
+def _fetch_due_buckets(conn, q) -> dict:
+    buckets = {b: [] for b in DUE_BUCKETS}
+    for r in conn.execute(q):
+        buckets[r.bucket].append(r)
+    return buckets
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -150,28 +215,88 @@ def _label(t: str) -> str: return LABELS.get(t, t)
 
 def _local_tz(): return datetime.now().astimezone().tzinfo
 
+# Clock pinned once per run(); the same timestamps recur across the due,
+# missed and recent tables, so parsing and _fmt_ts/_ago are memoized.
+_RUN_NOW = None
+_RUN_TZ = None
+_RUN_EPOCH = None
+
+def _start_clock() -> None:
+    global _RUN_NOW, _RUN_TZ, _RUN_EPOCH
+    _RUN_NOW = datetime.now().astimezone()
+    _RUN_TZ = _RUN_NOW.tzinfo
+    _RUN_EPOCH = _RUN_NOW.timestamp()
+    _fmt_ts.cache_clear(); _ago.cache_clear()
+
+@lru_cache(maxsize=8192)
+def _parse_ts(iso_ts: str) -> datetime:
+    dt = datetime.fromisoformat(iso_ts.replace("Z","+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+@lru_cache(maxsize=8192)
 def _fmt_ts(iso_ts: str) -> str:
     if not iso_ts: return "—"
-    dt = datetime.fromisoformat(iso_ts.replace("Z","+00:00"))
-    if dt.tzinfo is None: dt = dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(_local_tz()).strftime("%Y-%m-%d %H:%M:%S")
+    return _parse_ts(iso_ts).astimezone(_RUN_TZ or _local_tz()).strftime("%Y-%m-%d %H:%M:%S")
 
+@lru_cache(maxsize=8192)
 def _ago(iso_ts: str) -> str:
     if not iso_ts: return ""
-    dt = datetime.fromisoformat(iso_ts.replace("Z","+00:00"))
-    if dt.tzinfo is None: dt = dt.replace(tzinfo=timezone.utc)
-    delta = datetime.now().astimezone() - dt.astimezone(_local_tz())
-    secs = int(delta.total_seconds())
+    now = _RUN_EPOCH if _RUN_EPOCH is not None else datetime.now().timestamp()
+    secs = int(now - _parse_ts(iso_ts).timestamp())
     d, h, m = secs//86400, (secs%86400)//3600, (secs%3600)//60
     return f"{d}d ago" if d else (f"{h}h ago" if h else f"{m}m ago")
 
+# Few distinct theme strings recur across many rows: parse each one once.
+_COMMA_TO_SPACE = str.maketrans(",", " ")
+
+@lru_cache(maxsize=8192)
+def _split_themes(themes_csv: str) -> tuple:
+    return tuple(themes_csv.translate(_COMMA_TO_SPACE).split())
+
+# Rendered label strings depend only on (csv, n) and the static LABELS map.
+@lru_cache(maxsize=4096)
 def _first_themes(themes_csv: str, n=THEME_COUNT) -> str:
     if not themes_csv: return ""
-    parts = [p.strip() for p in themes_csv.replace(",", " ").split() if p.strip()]
+    parts = _split_themes(themes_csv)
     return ", ".join(_label(p) for p in parts[:n]) if parts else ""
 
+def _fetch_theme_agg(conn, q) -> tuple[dict, dict]:
+    """(all-time, 90-day) {theme: (attempts, wins)} from the THEME_AGG totals."""
+    agg_all, agg90 = {}, {}
+    for theme, n_all, w_all, n_90, w_90 in conn.execute(q):
+        agg_all[theme] = (n_all, w_all)
+        if n_90: agg90[theme] = (n_90, w_90)
+    return agg_all, agg90
+
+# name -> (query, fetch); all read-only and independent of each other
+REPORT_QUERIES = {
+    "kpi":    (KPI, _fetch_all),
+    "missed": (MISSED_30, _fetch_all),
+    "due":    (DUE_ALL, _fetch_due_buckets),
+    "themes": (THEME_AGG, _fetch_theme_agg),
+    "recent": (RECENT_ATTEMPTS, _fetch_all),
+}
+
+def _load_report_data(engine) -> dict:
+    """Results for REPORT_QUERIES, all read from one snapshot of the DB."""
+    with engine.connect() as conn:
+        # pysqlite opens no transaction for SELECTs: BEGIN explicitly so every
+        # query sees the same WAL snapshot even if a sync or /log commits
+        # mid-report (ended by the rollback when the connection is released)
+        conn.exec_driver_sql("BEGIN")
+        return {name: fetch(conn, q) for name, (q, fetch) in REPORT_QUERIES.items()}
+
+def _ids_json(rows) -> str:
+    # puzzle ids are [A-Za-z0-9]; "</" cannot occur, so this is safe inside <script>
+    ids = [r[0] for r in rows]
+    if orjson is not None:
+        return orjson.dumps(ids).decode("utf-8")
+    return json.dumps(ids, separators=(",", ":"))
+
 def _acc(attempts, wins): return round(100.0 * wins / attempts, 1) if attempts else None
 
+def _pct(v) -> str: return f"{v}%" if v is not None else "n/a"
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # [RP-5] HTML table renderers
@@ -180,24 +305,33 @@ def _acc(attempts, wins): return round(100.0 * wins / attempts, 1) if attempts e
 def _html_table(headers, rows, col_specs, table_id=None, extra_classes="", page_size=PAGE_SIZE):
     colgroup = "".join(f'<col style="width:{w}">' for w in col_specs)
     thead = "<thead><tr>" + "".join(f"<th>{h}</th>" for h in headers) + "</tr></thead>"
-    body_rows = []
-    for r in rows:
-        tds = [f"<td>{'' if v is None else v}</td>" for v in r]
-        body_rows.append("<tr>" + "".join(tds) + "</tr>")
-    tbody = "<tbody>" + "".join(body_rows) + "</tbody>"
-    tid = f' id="{table_id}"' if table_id else ""
+    row_tpl = "<tr>" + "<td>{}</td>" * len(headers) + "</tr>"
     classes = (extra_classes or "")
-    ds  = f' data-page-size="{page_size}"' if "paged" in classes else ""
+    paged = "paged" in classes
+    step = page_size if paged and page_size > 0 else max(len(rows), 1)
+    # one <tbody> per page; pages after the first start hidden (see PAGER_JS)
+    tbody = "".join(
+        ("<tbody hidden>" if i else "<tbody>")
+        + "".join(row_tpl.format(*("" if v is None else v for v in r)) for r in rows[i:i + step])
+        + "</tbody>"
+        for i in range(0, max(len(rows), 1), step)
+    )
+    tid = f' id="{table_id}"' if table_id else ""
+    ds  = f' data-page-size="{page_size}" data-body-paged' if paged else ""
     cls = f' class="{classes}"' if classes else ""
     return f'<table{tid}{cls}{ds}><colgroup>{colgroup}</colgroup>{thead}{tbody}</table><div class="pager"></div>'
 
+RECENT_ROW_TPL = ("<tr><td><a href='https://lichess.org/training/%s' target='_blank' rel='noopener'>%s</a></td>"
+                  "<td>%s</td><td>%s</td><td>%s (%s)</td></tr>")
+RECENT_PAGE_BREAK = "</tbody><tbody hidden>"   # one <tbody> per PAGE_SIZE rows
+
 def _html_due(rows, table_id=None):
     headers = ["Puzzle","Theme","Attempts","Last Attempt","Due"]
     col_specs = ["6ch","auto","5ch","28ch","12ch"]  # ensure consistent widths
     if not rows:
         return _html_table(headers, [["—","—","0","—","—"]], col_specs, table_id, "filterable paged")
     out = []
-    for pid, themes, due, attempts, last_attempt in rows:
+    for pid, themes, due, attempts, last_attempt, *_ in rows:
         last = f"{_fmt_ts(last_attempt)} ({_ago(last_attempt)})" if last_attempt else "—"
         out.append([
             f'<a href="https://lichess.org/training/{pid}" target="_blank" rel="noopener">{pid}</a>',
@@ -236,238 +370,241 @@ def _html_themes(agg, title, table_id=None):
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# [RP-6] main
+# [RP-6] Page templates (static CSS/JS, built once per process)
 # ─────────────────────────────────────────────────────────────────────────────
 
-def run(engine, outdir: str = "reports"):
-    out = Path(outdir); out.mkdir(parents=True, exist_ok=True)
-
-    with engine.begin() as conn:
-        kpi   = conn.execute(KPI).mappings().one()
-        k7    = conn.execute(KPI7).mappings().one()
-        k30   = conn.execute(KPI30).mappings().one()
-        missed = conn.execute(MISSED_30).all()
-        due_today = conn.execute(DUE_ONLY_TODAY).all()
-        due_over  = conn.execute(DUE_OVERDUE).all() if INCLUDE_OVERDUE else []
-        due_p1    = conn.execute(DUE_PLUS1).all()
-        due_p7    = conn.execute(DUE_2_7).all()
-        due_later = conn.execute(DUE_LATER).all()
-        rows90    = conn.execute(THEME_ROWS_90).all()
-        rows_all  = conn.execute(THEME_ROWS_ALL).all()
-        recent    = conn.execute(RECENT_ATTEMPTS).all()
-
-    # theme aggregates
-    attempts90 = Counter(); wins90 = Counter()
-    for r in rows90:
-        for t in (r.themes_csv or "").replace(",", " ").split():
-            attempts90[t] += 1
-            if r.result == "win": wins90[t] += 1
-    agg90 = {t:(attempts90[t], wins90[t]) for t in attempts90}
-
-    attempts_all = Counter(); wins_all = Counter()
-    for r in rows_all:
-        for t in (r.themes_csv or "").replace(",", " ").split():
-            attempts_all[t] += 1
-            if r.result == "win": wins_all[t] += 1
-    agg_all = {t:(attempts_all[t], wins_all[t]) for t in attempts_all}
-
-    # ---------- DAILY HTML ----------
-    if (os.getenv("REPORT_HTML","false").lower() in ("1","true","yes","on")):
-        daily_head = f"""<!doctype html>
-<html lang="en"><head>
-<meta charset="utf-8"/><meta name="viewport" content="width=device-width, initial-scale=1"/>
-<title>Lichess Puzzle Report — {date.today().isoformat()}</title>
-<style>
-:root {{ --bg:#fff; --fg:#0f172a; --muted:#64748b; --border:#e2e8f0; --row:#f8fafc; --accent:#2563eb; }}
-* {{ box-sizing:border-box; }}
-body {{ margin:0; background:var(--bg); color:var(--fg);
-       font:14px/1.6 -apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,Arial,"Noto Sans"; }}
-.layout {{ display:grid; grid-template-columns: 220px 1fr; min-height:100vh; }}
-aside {{ position:sticky; top:0; height:100vh; border-right:1px solid var(--border); padding:16px; }}
-aside h2 {{ margin:0 0 8px; font-size:14px; color:var(--muted); }}
-nav a {{ display:block; padding:6px 8px; border-radius:6px; text-decoration:none; color:inherit; }}
-nav a:hover {{ background:#f1f5f9; }}
-main {{ padding:24px; max-width:1200px; margin:0 auto; }}
-h1 {{ font-size:28px; margin:0 0 12px; }}
-h2 {{ font-size:20px; margin:22px 0 8px; }}
-.kpis{{display:grid; grid-template-columns:repeat(4, minmax(220px,1fr)); gap:12px; margin:16px 0;}}
-.kpi{{border:1px solid var(--border); border-radius:10px; padding:12px;}}
-.kpi .label{{color:var(--muted); font-size:12px;}} .kpi .value{{font-size:22px; font-weight:600;}}
-.controls{{display:flex; gap:8px; align-items:center; margin:8px 0 16px; flex-wrap:wrap;}}
-.controls input[type="text"]{{padding:6px 8px; border:1px solid var(--border); border-radius:6px;}}
-.controls button, .controls select, .controls label{{padding:6px 8px; border:1px solid var(--border); border-radius:6px; background:#fff; cursor:pointer;}}
-.controls button:hover{{background:#f8fafc;}}
-table{{ width:100%; border-collapse:collapse; margin:8px 0 16px; table-layout:auto; }}
-th,td{{ border:1px solid var(--border); padding:8px 10px; vertical-align:top; }}
-thead th{{ background:#f1f5f9; position:sticky; top:0; z-index:1; }}
-tbody tr:nth-child(even){{ background:var(--row); }}
-a{{ color:var(--accent); text-decoration:none; }} a:hover{{ text-decoration:underline; }}
-.small{{font-size:12px; color:var(--muted);}}
-td,th{{ font-variant-numeric: tabular-nums; }}
-.pager{{display:flex; gap:6px; align-items:center; flex-wrap:wrap; margin:-6px 0 12px;}}
-.pager button{{padding:4px 8px; border:1px solid var(--border); border-radius:6px; background:#fff; cursor:pointer;}}
-.pager button.active{{background:#e2e8f0;}}
-.pager button:disabled{{opacity:.5; cursor:not-allowed;}}
+DAILY_CSS = """:root { --bg:#fff; --fg:#0f172a; --muted:#64748b; --border:#e2e8f0; --row:#f8fafc; --accent:#2563eb; }
+* { box-sizing:border-box; }
+body { margin:0; background:var(--bg); color:var(--fg);
+       font:14px/1.6 -apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,Arial,"Noto Sans"; }
+.layout { display:grid; grid-template-columns: 220px 1fr; min-height:100vh; }
+aside { position:sticky; top:0; height:100vh; border-right:1px solid var(--border); padding:16px; }
+aside h2 { margin:0 0 8px; font-size:14px; color:var(--muted); }
+nav a { display:block; padding:6px 8px; border-radius:6px; text-decoration:none; color:inherit; }
+nav a:hover { background:#f1f5f9; }
+main { padding:24px; max-width:1200px; margin:0 auto; }
+h1 { font-size:28px; margin:0 0 12px; }
+h2 { font-size:20px; margin:22px 0 8px; }
+.kpis{display:grid; grid-template-columns:repeat(4, minmax(220px,1fr)); gap:12px; margin:16px 0;}
+.kpi{border:1px solid var(--border); border-radius:10px; padding:12px;}
+.kpi .label{color:var(--muted); font-size:12px;} .kpi .value{font-size:22px; font-weight:600;}
+.controls{display:flex; gap:8px; align-items:center; margin:8px 0 16px; flex-wrap:wrap;}
+.controls input[type="text"]{padding:6px 8px; border:1px solid var(--border); border-radius:6px;}
+.controls button, .controls select, .controls label{padding:6px 8px; border:1px solid var(--border); border-radius:6px; background:#fff; cursor:pointer;}
+.controls button:hover{background:#f8fafc;}
+table{ width:100%; border-collapse:collapse; margin:8px 0 16px; table-layout:auto; }
+th,td{ border:1px solid var(--border); padding:8px 10px; vertical-align:top; }
+thead th{ background:#f1f5f9; position:sticky; top:0; z-index:1; }
+tbody tr:nth-child(even){ background:var(--row); }
+a{ color:var(--accent); text-decoration:none; } a:hover{ text-decoration:underline; }
+.small{font-size:12px; color:var(--muted);}
+td,th{ font-variant-numeric: tabular-nums; }
+.pager{display:flex; gap:6px; align-items:center; flex-wrap:wrap; margin:-6px 0 12px;}
+.pager button{padding:4px 8px; border:1px solid var(--border); border-radius:6px; background:#fff; cursor:pointer;}
+.pager button.active{background:#e2e8f0;}
+.pager button:disabled{opacity:.5; cursor:not-allowed;}
+tr.row-hidden{display:none;}
 
 /* center numeric Attempts, keep Theme left/wrapped */
 #due-today table th:nth-child(3),  #due-today table td:nth-child(3),
 #due-plus1 table th:nth-child(3),  #due-plus1 table td:nth-child(3),
 #due-p7    table th:nth-child(3),  #due-p7    table td:nth-child(3),
 #due-later table th:nth-child(3),  #due-later table td:nth-child(3),
-#missed    table th:nth-child(3),  #missed    table td:nth-child(3) {{ text-align:center; }}
+#missed    table th:nth-child(3),  #missed    table td:nth-child(3) { text-align:center; }
 #due-today table td:nth-child(2),
 #due-plus1 table td:nth-child(2),
 #due-p7    table td:nth-child(2),
 #due-later table td:nth-child(2),
-#missed    table td:nth-child(2) {{ text-align:left; white-space:normal; overflow-wrap:anywhere; }}
-</style>
-</head>
-<body>
-<div class="layout">
-  <aside>
-    <h2>Navigation</h2>
-    <nav>
-      <a href="index.html">Overall Tracker →</a>
-      <a href="#kpis">Stats</a>
-      <a href="#due-today">Due Today</a>
-      {"<a href=\"#overdue\">Overdue</a>" if (INCLUDE_OVERDUE and __import__('builtins').len(due_over)>0) else ""}
-      <a href="#themes-top">Top Themes (90d)</a>
-      <a href="#themes-struggle">Struggle Themes (90d)</a>
-      <a href="#missed">Missed (30d)</a>
-      <a href="#due-plus1">+1 Day</a>
-      <a href="#due-p7">+2–7 Days</a>
-      <a href="#due-later">Later</a>
-    </nav>
-  </aside>
-  <main>
-    <section id="kpis">
-      <h1>Lichess Puzzle Report — {date.today().isoformat()}</h1>
-      <div class="kpis">
-        <div class="kpi"><div class="label">All-time attempts</div><div class="value">{kpi['attempts']}</div></div>
-        <div class="kpi"><div class="label">All-time accuracy</div><div class="value">{kpi['acc'] if kpi['acc'] is not None else 'n/a'}%</div></div>
-        <div class="kpi"><div class="label">Last 7 days accuracy</div><div class="value">{k7['acc7'] if k7['acc7'] is not None else 'n/a'}%</div></div>
-        <div class="kpi"><div class="label">Last 30 days accuracy</div><div class="value">{k30['acc30'] if k30['acc30'] is not None else 'n/a'}%</div></div>
-      </div>
-    </section>
-
-    <section id="due-today">
-      <h2>Due Today ({len(due_today)})</h2>
-      <div class="controls" data-for="due-today">
-        <input type="text" placeholder="Filter (theme or ID)"/>
-        <label><input type="checkbox" id="shuffle-due"> Shuffle</label>
-        <select id="batch-n"><option>5</option><option selected>10</option><option>20</option><option>50</option></select>
-        <button data-open="first">Start</button>
-        <button data-open="next">Next (from report)</button>
-        <button data-open="batch">Open batch</button>
-        <button data-reset>Reset</button>
-      </div>
-      {_html_due(due_today, table_id="due-today-table")}
-    </section>
-
-    {("<section id=\"overdue\"><h2>Overdue (" + str(len(due_over)) + ")</h2>" + _html_due(due_over, table_id="overdue-table") + "</section>") if (INCLUDE_OVERDUE and len(due_over)>0) else ""}
-
-    <section id="themes-top">{_html_themes(agg90, "Top Themes (last 90 days)", table_id="themes-top-table")}</section>
-    <section id="themes-struggle">{_html_themes({t:v for t,v in agg90.items() if v[0]>=8 and (_acc(*v) is None or _acc(*v) <= 60.0)}, "Struggle Themes (last 90 days)", table_id="themes-struggle-table")}</section>
-
-    <section id="missed">
-      <h2>Missed (last 30 days)</h2>
-      <div class="controls" data-for="missed">
-        <input type="text" placeholder="Filter (theme or ID)"/>
-      </div>
-      {_html_missed(missed, table_id="missed-table")}
-    </section>
-
-    <section id="due-plus1"><h2>+1 Day ({len(due_p1)})</h2>{_html_due(due_p1, table_id="plus1-table")}</section>
-    <section id="due-p7"><h2>+2–7 Days ({len(due_p7)})</h2>{_html_due(due_p7, table_id="p7-table")}</section>
-    <section id="due-later"><h2>Later ({len(due_later)})</h2>{_html_due(due_later, table_id="later-table")}</section>
-
-    <div class="small">Generated {datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S %Z")}</div>
-  </main>
-</div>
+#missed    table td:nth-child(2) { text-align:left; white-space:normal; overflow-wrap:anywhere; }
 """
-        # Daily JS — fixed pagination (separate filter vs paging)
-        JS_TEMPLATE = r"""
-<script>
-(function(){
-  const REPORT_DATE = "__REPORT_DATE__";
-  const LS_KEY = "dueQueueState"; // { date, ids[], idx }
-  const PERSIST_ACROSS_DAYS = __QUEUE_PERSIST__;
 
-  function rowsOf(table){ return Array.from(table.querySelectorAll('tbody tr')); }
-  function textOfRow(tr){ return tr.innerText.toLowerCase(); }
+TRACKER_CSS = """:root { --bg:#fff; --fg:#0f172a; --muted:#64748b; --border:#e2e8f0; --row:#f8fafc; --accent:#2563eb; }
+* { box-sizing:border-box; }
+body { margin:0; background:var(--bg); color:var(--fg);
+       font:14px/1.6 -apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,Arial,"Noto Sans"; }
+.layout { display:grid; grid-template-columns: 220px 1fr; min-height:100vh; }
+aside { position:sticky; top:0; height:100vh; border-right:1px solid var(--border); padding:16px; }
+aside h2 { margin:0 0 8px; font-size:14px; color:var(--muted); }
+nav a { display:block; padding:6px 8px; border-radius:6px; text-decoration:none; color:inherit; }
+nav a:hover { background:#f1f5f9; }
+main { padding:24px; max-width:1200px; margin:0 auto; }
+h1 { font-size:28px; margin:0 0 12px; }
+h2 { font-size:20px; margin:22px 0 8px; }
+.kpis{display:grid; grid-template-columns:repeat(4, minmax(220px,1fr)); gap:12px; margin:16px 0;}
+.kpi{border:1px solid var(--border); border-radius:10px; padding:12px;}
+.kpi .label{color:var(--muted); font-size:12px;} .kpi .value{font-size:22px; font-weight:600;}
+table{ width:100%; border-collapse:collapse; margin:8px 0 16px; }
+th,td{ border:1px solid var(--border); padding:8px 10px; vertical-align:top; }
+thead th{ background:#f1f5f9; position:sticky; top:0; z-index:1; }
+tbody tr:nth-child(even){ background:var(--row); }
+a{ color:var(--accent); text-decoration:none; } a:hover{ text-decoration:underline; }
+.small{font-size:12px; color:var(--muted);}
+td,th{ font-variant-numeric: tabular-nums; }
+.pager{display:flex; gap:6px; align-items:center; flex-wrap:wrap; margin:-6px 0 12px;}
+.pager button{padding:4px 8px; border:1px solid var(--border); border-radius:6px; background:#fff; cursor:pointer;}
+.pager button.active{background:#e2e8f0;}
+.pager button:disabled{opacity:.5; cursor:not-allowed;}
+tr.row-hidden{display:none;}
+"""
 
-  // ---- filtering marks rows instead of removing from pagination set
-  function applyFilter(table, query){
-    const q = (query || "").trim().toLowerCase();
-    rowsOf(table).forEach(tr => {
-      const hide = q && !textOfRow(tr).includes(q);
-      tr.dataset.filtered = hide ? "1" : "0";             // <-- mark filtered
-      tr.style.display = hide ? "none" : "";              // for immediate UX
-    });
-    paginateTable(table); // re-page based on filtered set
+# %-templates. The CSS is substituted as a value; DAILY_HEAD keeps %(date)s
+# for run(), so its CSS "%" is escaped for that second pass.
+_HEAD_TMPL = """<!doctype html>
+<html lang="en"><head>
+<meta charset="utf-8"/><meta name="viewport" content="width=device-width, initial-scale=1"/>
+<title>%(title)s</title>
+<style>
+%(css)s</style>
+</head>
+"""
+# minimal Markdown summary written next to the daily page
+_MD_TEMPLATE = (
+    "# Lichess Puzzle Report — {d}\n"
+    "- All-time attempts: {attempts}\n"
+    "- All-time accuracy: {acc}\n"
+    "- Last 7 days accuracy: {acc7}\n"
+    "- Last 30 days accuracy: {acc30}\n"
+)
+DAILY_HEAD = _HEAD_TMPL % {"title": "Lichess Puzzle Report — %(date)s", "css": DAILY_CSS.replace("%", "%%")}
+TRACKER_HEAD = _HEAD_TMPL % {"title": "Lichess Puzzle Tracker", "css": TRACKER_CSS}
+
+# Shared by both pages. Paged tables arrive with one <tbody> per page and all
+# but the first `hidden` (data-body-paged), so an unfiltered page change only
+# flips `hidden` on the tbodies; while a filter is active the non-filtered rows
+# are paged one by one across every tbody instead.
+PAGER_JS = r"""  // the rows of a report table never change, so they are collected once
+  function rowsOf(table){ return table._rows || (table._rows = Array.from(table.querySelectorAll('tbody tr'))); }
+  // cell text joined by tabs (what innerText gives for a rendered row), read
+  // once per table on the first filter; hidden pages no longer read differently
+  function textOfRow(tr){ return Array.from(tr.cells, td => td.textContent).join("\t").toLowerCase(); }
+  function rowTexts(table){ return table._rowText || (table._rowText = rowsOf(table).map(textOfRow)); }
+  // per-row filter flags (1 = filtered out), parallel to rowsOf(table)
+  function filterFlags(table){ return table._filtered || (table._filtered = new Uint8Array(rowsOf(table).length)); }
+  // non-filtered rows in order; rebuilt only when a filter changes
+  function refreshVisible(table){
+    const flags = filterFlags(table);
+    table._visibleRows = rowsOf(table).filter((tr, i) => !flags[i]);
+    table._shown = null;   // next row-paged pass starts from a full hide
+    return table._visibleRows;
   }
 
-  // ---- pagination uses only non-filtered rows
+  const PAGER_BUTTONS = 7, PAGER_HALF = PAGER_BUTTONS >> 1;   // numbered buttons around the current page
+
   function paginateTable(table){
     const ps = parseInt(table.dataset.pageSize || "10", 10);
-    const body = table.tBodies[0];
-    const all = Array.from(body.rows);
-    const eligible = all.filter(r => r.dataset.filtered !== "1");   // <-- key fix
     const pager = (table.nextElementSibling && table.nextElementSibling.classList.contains('pager'))
       ? table.nextElementSibling : null;
     if(!pager) return;
 
-    // current page
+    const bodies = Array.from(table.tBodies);
+    const byBody = table.hasAttribute('data-body-paged') && table.dataset.filterActive !== "1";
     let cur = parseInt(table.dataset.pageIndex || "0", 10);
-    const pages = Math.max(Math.ceil(eligible.length / ps), 1);
-    if(cur >= pages) cur = pages - 1;
-    table.dataset.pageIndex = String(cur);
-
-    // show eligible rows on current page; hide the rest
-    eligible.forEach((tr, i) => {
-      const page = Math.floor(i / ps);
-      tr.style.visibility = (page === cur) ? "" : "hidden";
-      tr.style.display    = (page === cur) ? "" : "none";
-    });
-    // filtered rows remain hidden
-    all.forEach(tr => {
-      if(tr.dataset.filtered === "1"){
-        tr.style.display = "none";
-        tr.style.visibility = "hidden";
+    let pages;
+    if(byBody){
+      pages = Math.max(bodies.length, 1);
+      if(cur >= pages) cur = pages - 1;
+      if(table.dataset.rowPaged === "1"){   // leaving filter mode: unhide every row
+        rowsOf(table).forEach(tr => tr.classList.remove('row-hidden'));
+        table.dataset.rowPaged = "0";
+        table._shown = null;
       }
-    });
+      bodies.forEach((tb, i) => { if(tb.hidden !== (i !== cur)) tb.hidden = (i !== cur); });
+    } else {
+      const eligible = table._visibleRows || refreshVisible(table);
+      pages = Math.max(Math.ceil(eligible.length / ps), 1);
+      if(cur >= pages) cur = pages - 1;
+      // after a filter change hide every row once; page flips then only
+      // touch the rows of the old and the new page, and a repaginate of the
+      // page already shown (e.g. on resize) touches none
+      if(!table._shown){
+        rowsOf(table).forEach(tr => tr.classList.add('row-hidden'));
+        table._shown = [];
+        table._shownStart = -1;
+      }
+      const start = cur * ps;
+      if(table._shownStart !== start){
+        table._shown.forEach(tr => tr.classList.add('row-hidden'));
+        table._shown = eligible.slice(start, start + ps);
+        table._shown.forEach(tr => tr.classList.remove('row-hidden'));
+        table._shownStart = start;
+      }
+      bodies.forEach(tb => { if(tb.hidden) tb.hidden = false; });
+      table.dataset.rowPaged = "1";
+    }
+    table.dataset.pageIndex = String(cur);
 
-    // build pager
-    pager.innerHTML = "";
-    function btn(label, disabled, onClick, active=false){
+    // build pager; one delegated listener per pager reads the target page
+    // from data-page, so rebuilding the buttons allocates no closures
+    if(!pager._delegated){
+      pager.addEventListener('click', e => {
+        const b = e.target.closest('button[data-page]');
+        if(!b || b.disabled) return;
+        table.dataset.pageIndex = b.dataset.page;
+        paginateTable(table);
+      });
+      pager._delegated = true;
+    }
+    const frag = document.createDocumentFragment();   // swapped into the pager once
+    function btn(label, page, disabled, active=false){
       const b = document.createElement('button');
       b.type = "button";
       b.textContent = label;
+      b.dataset.page = String(page);
       if(disabled) b.disabled = true;
       if(active) b.classList.add('active');
-      b.addEventListener('click', onClick);
-      pager.appendChild(b);
+      frag.appendChild(b);
     }
-    btn("«", cur===0, ()=>{ table.dataset.pageIndex="0"; paginateTable(table); });
-    btn("‹", cur===0, ()=>{ table.dataset.pageIndex=String(cur-1); paginateTable(table); });
-
-    const maxButtons = 7;
-    const start = Math.max(0, cur - Math.floor(maxButtons/2));
-    const end = Math.min(pages, start + maxButtons);
-    for(let i=start;i<end;i++){
-      btn(String(i+1), false, ()=>{ table.dataset.pageIndex=String(i); paginateTable(table); }, i===cur);
+    btn("«", 0, cur===0);
+    btn("‹", cur-1, cur===0);
+
+    const first = cur > PAGER_HALF ? cur - PAGER_HALF : 0;
+    let last = first + PAGER_BUTTONS;
+    if(last > pages) last = pages;
+    for(let i=first;i<last;i++){
+      btn(String(i+1), i, false, i===cur);
     }
 
-    btn("›", cur>=pages-1, ()=>{ table.dataset.pageIndex=String(cur+1); paginateTable(table); });
-    btn("»", cur>=pages-1, ()=>{ table.dataset.pageIndex=String(pages-1); paginateTable(table); });
+    btn("›", cur+1, cur>=pages-1);
+    btn("»", pages-1, cur>=pages-1);
+    pager.replaceChildren(frag);
   }
 
-  // init filter + pagination for every paged/filterable table
-  document.querySelectorAll('table.paged').forEach(t => {
-    // mark all rows as not filtered initially
-    rowsOf(t).forEach(tr => tr.dataset.filtered = tr.dataset.filtered || "0");
-    paginateTable(t);
-  });
+  // resize bursts coalesce into one repaginate per animation frame; the
+  // listener never calls preventDefault, so it is registered passive
+  function repaginateOnResize(tables){
+    let pending = false;
+    window.addEventListener('resize', () => {
+      if(pending) return;
+      pending = true;
+      requestAnimationFrame(() => { pending = false; tables.forEach(t => paginateTable(t)); });
+    }, { passive: true });
+  }
+"""
+
+# Daily JS — fixed pagination (separate filter vs paging)
+DAILY_JS_TEMPLATE = r"""
+<script>
+(function(){
+  const REPORT_DATE = "__REPORT_DATE__";
+  const LS_KEY = "dueQueueState"; // { date, ids[], idx }
+  const PERSIST_ACROSS_DAYS = __QUEUE_PERSIST__;
+
+__PAGER_JS__
+  // ---- filtering marks rows instead of removing from pagination set
+  function applyFilter(table, query){
+    const q = (query || "").trim().toLowerCase();
+    const flags = filterFlags(table), texts = rowTexts(table);
+    for(let i = 0; i < texts.length; i++){
+      flags[i] = (q && !texts[i].includes(q)) ? 1 : 0;   // <-- mark filtered
+    }
+    refreshVisible(table);
+    table.dataset.filterActive = q ? "1" : "0";
+    paginateTable(table); // re-page based on filtered set
+  }
+
+  // build the pager for every paged table (the report already hides pages 2+)
+  const pagedTables = Array.from(document.querySelectorAll('table.paged'));
+  pagedTables.forEach(t => paginateTable(t));
 
   document.querySelectorAll('.controls').forEach(ctrl => {
     const section = ctrl.closest('section');
@@ -483,9 +620,12 @@ td,th{{ font-variant-numeric: tabular-nums; }}
   const shuffleEl = document.getElementById('shuffle-due');
   const batchSel  = document.getElementById('batch-n');
 
+  // due ids emitted by the report; the DOM is only scraped while a filter is active
+  const dueDataEl = document.getElementById('due-data');
+  const DUE_IDS = dueDataEl ? JSON.parse(dueDataEl.textContent) : [];
   function visibleIdsFrom(table){
-    return rowsOf(table)
-      .filter(tr => tr.dataset.filtered !== "1" && tr.style.display !== 'none')
+    if(table === dueTable && !filterFlags(table).includes(1)) return DUE_IDS.slice();
+    return (table._visibleRows || refreshVisible(table))   // every page, not just the shown one
       .map(tr => tr.querySelector('td a')?.textContent.trim())
       .filter(Boolean);
   }
@@ -568,64 +708,153 @@ td,th{{ font-variant-numeric: tabular-nums; }}
       const n = parseInt(batchSel.value, 10) || 10;
       openBatch(n);
     });
-    ctrls.querySelector('[data-reset"]').addEventListener('click', () => {
+    ctrls.querySelector('[data-reset]').addEventListener('click', () => {
       queue = visibleIdsFrom(dueTable).map(id => 'https://lichess.org/training/' + id); idx = 0; saveState();
     });
   }
 
-  window.addEventListener('resize', () => {
-    document.querySelectorAll('table.paged').forEach(t => paginateTable(t));
-  });
+  repaginateOnResize(pagedTables);
 })();
 </script>
 """
-        daily_js = JS_TEMPLATE.replace("__REPORT_DATE__", date.today().isoformat()) \
-                              .replace("__QUEUE_PERSIST__", "true" if QUEUE_PERSIST else "false")
+DAILY_JS = DAILY_JS_TEMPLATE.replace("__PAGER_JS__\n", PAGER_JS) \
+                            .replace("__QUEUE_PERSIST__", "true" if QUEUE_PERSIST else "false")
 
-        daily_path = out / f"{date.today().isoformat()}.html"
-        daily_path.write_text(daily_head + daily_js, encoding="utf-8")
+TRACKER_JS_TEMPLATE = r"""
+<script>
+(function(){
+__PAGER_JS__
+  // build the pager for every paged table (the report already hides pages 2+)
+  const pagedTables = Array.from(document.querySelectorAll('table.paged'));
+  pagedTables.forEach(t => paginateTable(t));
+
+  repaginateOnResize(pagedTables);
+})();
+</script>
+</body>
+</html>
+"""
+TRACKER_JS = TRACKER_JS_TEMPLATE.replace("__PAGER_JS__\n", PAGER_JS)
+
+# Conservative minifier for the script blocks: drops comments and indentation
+# but keeps line breaks (no reliance on ASI rules). A trailing comment is only
+# stripped when no quote follows the "//", so string literals such as URLs
+# are never cut.
+_JS_LINE_COMMENT = re.compile(r"^[ \t]*//[^\n]*\n", re.M)
+_JS_TRAILING_COMMENT = re.compile(r"[ \t]+//[^\n'\"`]*$", re.M)
+_JS_INDENT = re.compile(r"^[ \t]+|[ \t]+$", re.M)
+_JS_BLANK_LINES = re.compile(r"\n{2,}")
+
+def _minify_js(src: str) -> str:
+    src = _JS_LINE_COMMENT.sub("", src)
+    src = _JS_TRAILING_COMMENT.sub("", src)
+    src = _JS_INDENT.sub("", src)
+    return _JS_BLANK_LINES.sub("\n", src)
+
+# The script blocks are constant per process: minify and encode them once and
+# write the pages in binary mode (only the report date is spliced into the daily JS).
+_DAILY_JS_PRE, _DAILY_JS_POST = (part.encode("utf-8") for part in _minify_js(DAILY_JS).split("__REPORT_DATE__", 1))
+_TRACKER_JS_BYTES = _minify_js(TRACKER_JS).encode("utf-8")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# [RP-7] main
+# ─────────────────────────────────────────────────────────────────────────────
+
+def run(engine, outdir: str = "reports"):
+    out = Path(outdir); out.mkdir(parents=True, exist_ok=True)
+    _start_clock()
+    today = date.today().isoformat()   # one value for every file name and heading of this run
+
+    data = _load_report_data(engine)
+    kpi = data["kpi"][0]._mapping
+    pcts = {k: _pct(kpi[k]) for k in ("acc", "acc7", "acc30")}   # formatted once for both pages and the md
+    missed = data["missed"]
+    due_today, due_over, due_p1, due_p7, due_later = (data["due"][b] for b in ("today", "overdue", "p1", "p7", "later"))
+    agg_all, agg90 = data["themes"]
+    recent = data["recent"]
+
+    # ---------- DAILY HTML ----------
+    if (os.getenv("REPORT_HTML","false").lower() in ("1","true","yes","on")):
+        daily_head = DAILY_HEAD % {"date": today} + f"""<body>
+<div class="layout">
+  <aside>
+    <h2>Navigation</h2>
+    <nav>
+      <a href="index.html">Overall Tracker →</a>
+      <a href="#kpis">Stats</a>
+      <a href="#due-today">Due Today</a>
+      {"<a href=\"#overdue\">Overdue</a>" if (INCLUDE_OVERDUE and __import__('builtins').len(due_over)>0) else ""}
+      <a href="#themes-top">Top Themes (90d)</a>
+      <a href="#themes-struggle">Struggle Themes (90d)</a>
+      <a href="#missed">Missed (30d)</a>
+      <a href="#due-plus1">+1 Day</a>
+      <a href="#due-p7">+2–7 Days</a>
+      <a href="#due-later">Later</a>
+    </nav>
+  </aside>
+  <main>
+    <section id="kpis">
+      <h1>Lichess Puzzle Report — {today}</h1>
+      <div class="kpis">
+        <div class="kpi"><div class="label">All-time attempts</div><div class="value">{kpi['attempts']}</div></div>
+        <div class="kpi"><div class="label">All-time accuracy</div><div class="value">{pcts['acc']}</div></div>
+        <div class="kpi"><div class="label">Last 7 days accuracy</div><div class="value">{pcts['acc7']}</div></div>
+        <div class="kpi"><div class="label">Last 30 days accuracy</div><div class="value">{pcts['acc30']}</div></div>
+      </div>
+    </section>
+
+    <section id="due-today">
+      <h2>Due Today ({len(due_today)})</h2>
+      <div class="controls" data-for="due-today">
+        <input type="text" placeholder="Filter (theme or ID)"/>
+        <label><input type="checkbox" id="shuffle-due"> Shuffle</label>
+        <select id="batch-n"><option>5</option><option selected>10</option><option>20</option><option>50</option></select>
+        <button data-open="first">Start</button>
+        <button data-open="next">Next (from report)</button>
+        <button data-open="batch">Open batch</button>
+        <button data-reset>Reset</button>
+      </div>
+      {_html_due(due_today, table_id="due-today-table")}
+      <script id="due-data" type="application/json">{_ids_json(due_today)}</script>
+    </section>
+
+    {("<section id=\"overdue\"><h2>Overdue (" + str(len(due_over)) + ")</h2>" + _html_due(due_over, table_id="overdue-table") + "</section>") if (INCLUDE_OVERDUE and len(due_over)>0) else ""}
+
+    <section id="themes-top">{_html_themes(agg90, "Top Themes (last 90 days)", table_id="themes-top-table")}</section>
+    <section id="themes-struggle">{_html_themes({t:v for t,v in agg90.items() if v[0]>=8 and (_acc(*v) is None or _acc(*v) <= 60.0)}, "Struggle Themes (last 90 days)", table_id="themes-struggle-table")}</section>
+
+    <section id="missed">
+      <h2>Missed (last 30 days)</h2>
+      <div class="controls" data-for="missed">
+        <input type="text" placeholder="Filter (theme or ID)"/>
+      </div>
+      {_html_missed(missed, table_id="missed-table")}
+    </section>
+
+    <section id="due-plus1"><h2>+1 Day ({len(due_p1)})</h2>{_html_due(due_p1, table_id="plus1-table")}</section>
+    <section id="due-p7"><h2>+2–7 Days ({len(due_p7)})</h2>{_html_due(due_p7, table_id="p7-table")}</section>
+    <section id="due-later"><h2>Later ({len(due_later)})</h2>{_html_due(due_later, table_id="later-table")}</section>
+
+    <div class="small">Generated {datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S %Z")}</div>
+  </main>
+</div>
+"""
+        daily_path = out / f"{today}.html"
+        with _atomic_write(daily_path, WRITE_BUFFER) as f:
+            f.write(daily_head.encode("utf-8"))
+            f.write(_DAILY_JS_PRE)
+            f.write(today.encode("ascii"))
+            f.write(_DAILY_JS_POST)
         print(f"[report] Wrote {daily_path}")
 
         # ---------- TRACKER (index.html) ----------
-        tracker_head = f"""<!doctype html>
-<html lang="en"><head>
-<meta charset="utf-8"/><meta name="viewport" content="width=device-width, initial-scale=1"/>
-<title>Lichess Puzzle Tracker</title>
-<style>
-:root {{ --bg:#fff; --fg:#0f172a; --muted:#64748b; --border:#e2e8f0; --row:#f8fafc; --accent:#2563eb; }}
-* {{ box-sizing:border-box; }}
-body {{ margin:0; background:var(--bg); color:var(--fg);
-       font:14px/1.6 -apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,Arial,"Noto Sans"; }}
-.layout {{ display:grid; grid-template-columns: 220px 1fr; min-height:100vh; }}
-aside {{ position:sticky; top:0; height:100vh; border-right:1px solid var(--border); padding:16px; }}
-aside h2 {{ margin:0 0 8px; font-size:14px; color:var(--muted); }}
-nav a {{ display:block; padding:6px 8px; border-radius:6px; text-decoration:none; color:inherit; }}
-nav a:hover {{ background:#f1f5f9; }}
-main {{ padding:24px; max-width:1200px; margin:0 auto; }}
-h1 {{ font-size:28px; margin:0 0 12px; }}
-h2 {{ font-size:20px; margin:22px 0 8px; }}
-.kpis{{display:grid; grid-template-columns:repeat(4, minmax(220px,1fr)); gap:12px; margin:16px 0;}}
-.kpi{{border:1px solid var(--border); border-radius:10px; padding:12px;}}
-.kpi .label{{color:var(--muted); font-size:12px;}} .kpi .value{{font-size:22px; font-weight:600;}}
-table{{ width:100%; border-collapse:collapse; margin:8px 0 16px; }}
-th,td{{ border:1px solid var(--border); padding:8px 10px; vertical-align:top; }}
-thead th{{ background:#f1f5f9; position:sticky; top:0; z-index:1; }}
-tbody tr:nth-child(even){{ background:var(--row); }}
-a{{ color:var(--accent); text-decoration:none; }} a:hover{{ text-decoration:underline; }}
-.small{{font-size:12px; color:var(--muted);}}
-td,th{{ font-variant-numeric: tabular-nums; }}
-.pager{{display:flex; gap:6px; align-items:center; flex-wrap:wrap; margin:-6px 0 12px;}}
-.pager button{{padding:4px 8px; border:1px solid var(--border); border-radius:6px; background:#fff; cursor:pointer;}}
-.pager button.active{{background:#e2e8f0;}}
-.pager button:disabled{{opacity:.5; cursor:not-allowed;}}
-</style>
-</head>
-<body>
+        tracker_head = TRACKER_HEAD + f"""<body>
 <div class="layout">
   <aside>
     <h2>Navigation</h2>
     <nav>
-      <a href="{date.today().isoformat()}.html">Today’s Report →</a>
+      <a href="{today}.html">Today’s Report →</a>
       <a href="archive.html">Archive →</a>
       <a href="#kpis">Stats</a>
       <a href="#queues">SRS Queues</a>
@@ -639,9 +868,9 @@ td,th{{ font-variant-numeric: tabular-nums; }}
       <h1>Lichess Puzzle Tracker</h1>
       <div class="kpis">
         <div class="kpi"><div class="label">All-time attempts</div><div class="value">{kpi['attempts']}</div></div>
-        <div class="kpi"><div class="label">All-time accuracy</div><div class="value">{kpi['acc'] if kpi['acc'] is not None else 'n/a'}%</div></div>
-        <div class="kpi"><div class="label">Last 7 days accuracy</div><div class="value">{k7['acc7'] if k7['acc7'] is not None else 'n/a'}%</div></div>
-        <div class="kpi"><div class="label">Last 30 days accuracy</div><div class="value">{k30['acc30'] if k30['acc30'] is not None else 'n/a'}%</div></div>
+        <div class="kpi"><div class="label">All-time accuracy</div><div class="value">{pcts['acc']}</div></div>
+        <div class="kpi"><div class="label">Last 7 days accuracy</div><div class="value">{pcts['acc7']}</div></div>
+        <div class="kpi"><div class="label">Last 30 days accuracy</div><div class="value">{pcts['acc30']}</div></div>
       </div>
     </section>
 
@@ -656,11 +885,13 @@ td,th{{ font-variant-numeric: tabular-nums; }}
 
     <section id="recent">
       <h2>Recent Attempts</h2>
-      <table id="recent-table" class="paged" data-page-size="{PAGE_SIZE}">
+      <table id="recent-table" class="paged" data-page-size="{PAGE_SIZE}" data-body-paged>
         <colgroup><col style="width:6ch"><col style="width:8ch"><col style="width:auto"><col style="width:28ch"></colgroup>
         <thead><tr><th>Puzzle</th><th>Result</th><th>Themes</th><th>When</th></tr></thead>
         <tbody>
-          {"".join(f"<tr><td><a href='https://lichess.org/training/{r.puzzle_id}' target='_blank' rel='noopener'>{r.puzzle_id}</a></td><td>{r.result.title()}</td><td>{_first_themes(r.themes)}</td><td>{_fmt_ts(r.attempted_at)} ({_ago(r.attempted_at)})</td></tr>" for r in recent)}
+          """
+        # (recent rows are written straight to the file between head and tail)
+        tracker_tail = f"""
         </tbody>
       </table>
       <div class="pager"></div>
@@ -673,95 +904,35 @@ td,th{{ font-variant-numeric: tabular-nums; }}
   </main>
 </div>
 """
-        TRACKER_JS = r"""
-<script>
-(function(){
-  function rowsOf(t){ return Array.from(t.querySelectorAll('tbody tr')); }
-  function textOfRow(tr){ return tr.innerText.toLowerCase(); }
-
-  function paginateTable(table){
-    const ps = parseInt(table.dataset.pageSize || "10", 10);
-    const body = table.tBodies[0];
-    const all  = Array.from(body.rows);
-    const eligible = all.filter(r => r.dataset.filtered !== "1");
-    const pager = (table.nextElementSibling && table.nextElementSibling.classList.contains('pager'))
-      ? table.nextElementSibling : null;
-    if(!pager) return;
-
-    let cur = parseInt(table.dataset.pageIndex || "0", 10);
-    const pages = Math.max(Math.ceil(eligible.length / ps), 1);
-    if(cur >= pages) cur = pages - 1;
-    table.dataset.pageIndex = String(cur);
-
-    eligible.forEach((tr, i) => {
-      const page = Math.floor(i / ps);
-      tr.style.visibility = (page === cur) ? "" : "hidden";
-      tr.style.display    = (page === cur) ? "" : "none";
-    });
-    all.forEach(tr => {
-      if(tr.dataset.filtered === "1"){
-        tr.style.display = "none";
-        tr.style.visibility = "hidden";
-      }
-    });
-
-    pager.innerHTML = "";
-    function btn(label, disabled, onClick, active=false){
-      const b = document.createElement('button');
-      b.type = "button";
-      b.textContent = label;
-      if(disabled) b.disabled = true;
-      if(active) b.classList.add('active');
-      b.addEventListener('click', onClick);
-      pager.appendChild(b);
-    }
-    btn("«", cur===0, ()=>{ table.dataset.pageIndex="0"; paginateTable(table); });
-    btn("‹", cur===0, ()=>{ table.dataset.pageIndex=String(cur-1); paginateTable(table); });
-
-    const maxButtons = 7;
-    const start = Math.max(0, cur - Math.floor(maxButtons/2));
-    const end = Math.min(pages, start + maxButtons);
-    for(let i=start;i<end;i++){
-      btn(String(i+1), false, ()=>{ table.dataset.pageIndex=String(i); paginateTable(table); }, i===cur);
-    }
-
-    btn("›", cur>=pages-1, ()=>{ table.dataset.pageIndex=String(cur+1); paginateTable(table); });
-    btn("»", cur>=pages-1, ()=>{ table.dataset.pageIndex=String(pages-1); paginateTable(table); });
-  }
-
-  // mark initial filter state and paginate all paged tables
-  document.querySelectorAll('table.paged').forEach(t => {
-    rowsOf(t).forEach(tr => tr.dataset.filtered = tr.dataset.filtered || "0");
-    paginateTable(t);
-  });
-
-  window.addEventListener('resize', () => {
-    document.querySelectorAll('table.paged').forEach(t => paginateTable(t));
-  });
-})();
-</script>
-</body>
-</html>
-"""
-        (out / "index.html").write_text(tracker_head + TRACKER_JS, encoding="utf-8")
-        print(f"[report] Wrote {out / 'index.html'}")
+        recent_rows = "".join((RECENT_PAGE_BREAK if i and i % PAGE_SIZE == 0 else "")
+                              + RECENT_ROW_TPL % (r.puzzle_id, r.puzzle_id, r.result.title(), _first_themes(r.themes),
+                                                  _fmt_ts(r.attempted_at), _ago(r.attempted_at))
+                              for i, r in enumerate(recent))   # RECENT_ATTEMPTS caps this at 100
+        # the same chunks go to index.html and its pre-compressed index.html.gz
+        with _atomic_write(out / "index.html", WRITE_BUFFER) as f, \
+             _atomic_write(out / "index.html.gz") as gz_raw, \
+             gzip.GzipFile(filename="index.html", mode="wb", fileobj=gz_raw, compresslevel=GZIP_LEVEL) as gz:
+            for chunk in (tracker_head.encode("utf-8"), recent_rows.encode("utf-8"),
+                          tracker_tail.encode("utf-8"), _TRACKER_JS_BYTES):
+                f.write(chunk)
+                gz.write(chunk)
+        print(f"[report] Wrote {out / 'index.html'} (+ index.html.gz)")
 
         # update overview/index/archive (NEW)
-        _write_overview_index_archive(out, daily_path, date.today().isoformat())
+        _write_overview_index_archive(out, daily_path, today)
         print(f"[report] Wrote {out / 'overview.html'}")
         print(f"[report] Wrote {out / 'index.html'}")
         print(f"[report] Wrote {out / 'archive.html'}")
 
     # minimal Markdown (kept for continuity)
-    md_path = out / f"{date.today().isoformat()}.md"
-    md = [
-        f"# Lichess Puzzle Report — {date.today().isoformat()}",
-        f"- All-time attempts: {kpi['attempts']}",
-        f"- All-time accuracy: {kpi['acc'] if kpi['acc'] is not None else 'n/a'}%",
-        f"- Last 7 days accuracy: {k7['acc7'] if k7['acc7'] is not None else 'n/a'}%",
-        f"- Last 30 days accuracy: {k30['acc30'] if k30['acc30'] is not None else 'n/a'}%",
-        ""
-    ]
-    md_path.write_text("\n".join(md), encoding="utf-8")
-    print(f"[report] Wrote {md_path}")
+    md_path = out / f"{today}.md"
+    md = _MD_TEMPLATE.format_map({
+        "d": today,
+        "attempts": kpi["attempts"],
+        **pcts,
+    })
+    if _write_if_changed(md_path, md.encode("utf-8")):
+        print(f"[report] Wrote {md_path}")
+    else:
+        print(f"[report] Unchanged {md_path}")
     return md_path
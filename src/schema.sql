@@ -26,6 +26,7 @@ CREATE TABLE IF NOT EXISTS attempts (
 );
 CREATE INDEX IF NOT EXISTS idx_attempts_user_time ON attempts(user_id, attempted_at DESC);
 CREATE INDEX IF NOT EXISTS idx_attempts_puzzle ON attempts(puzzle_id);
+CREATE INDEX IF NOT EXISTS idx_attempts_user_puzzle_time ON attempts(user_id, puzzle_id, attempted_at DESC);
 CREATE TABLE IF NOT EXISTS srs (
     user_id INTEGER NOT NULL REFERENCES users(id),
     puzzle_id TEXT NOT NULL REFERENCES puzzles(puzzle_id),
@@ -37,3 +38,4 @@ CREATE TABLE IF NOT EXISTS srs (
     PRIMARY KEY (user_id, puzzle_id)
 );
 CREATE INDEX IF NOT EXISTS idx_srs_due ON srs(due_date);
+CREATE INDEX IF NOT EXISTS idx_srs_user_due ON srs(user_id, due_date);
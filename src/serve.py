@@ -10,7 +10,7 @@
 # [3] Optional compute_srs import
 # [4] JSON helper
 # [5] DB helpers (ensure_user, insert_attempt, dedup)
-# [6] Recompute SRS (single-puzzle tolerant caller)
+# [6] Recompute SRS (tolerant caller + background worker)
 # [7] Query due rows
 # [8] HTML builder (_queue_html)  ├─ [H-1] Head/Styles
 #                                 ├─ [H-2] Toolbar
@@ -23,15 +23,27 @@
 # [9]  HTTP handler (routes + / → /queue redirect)
 # [10] Entrypoint (port-in-use help)
 # ─────────────────────────────── [1] Imports ───────────────────────────────
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import urlparse, parse_qs
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
 import sqlite3
+import hashlib
+import gzip
+import inspect
 import json
 import os
+import queue
+import re
+import threading
 import traceback
 
+try:
+    import orjson   # listed in requirements.txt; the stdlib json path is the fallback
+except ImportError:
+    orjson = None
+
 # Always import from the src package (relative import ensures it works with -m src.serve)
 from .config import (
     get_db_path,             # function to resolve DB path
@@ -43,7 +55,7 @@ from .config import (
     LICHESS_USERNAME,        # str
 )
 
-from .db import open_sqlite   # local db helper
+from .db import PRAGMAS   # same per-connection PRAGMAs as the SQLAlchemy engine
 
 # ─────────────────────────────── [2] Config / env ──────────────────────────
 # Directly use constants/functions from config.py
@@ -51,6 +63,7 @@ from .db import open_sqlite   # local db helper
 
 PORT = LOCAL_LOG_PORT
 USERNAME = LICHESS_USERNAME
+GZIP_LEVEL = 6   # /queue body is compressed once per cache rebuild, not per request
 
 # ──────────────────────── [3] Optional compute_srs import ──────────────────
 # Prefer package-style import (when serve.py is inside src/). Fall back for legacy.
@@ -63,23 +76,67 @@ except Exception:
         _compute = None
 
 # ───────────────────────────────── [4] JSON helper ─────────────────────────
+def _dumps(obj) -> bytes:
+    """Compact UTF-8 JSON; orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+_JSON_HEAD = (
+    "{proto} {status} {reason}\r\n"
+    "Server: {server}\r\n"
+    "Date: {date}\r\n"
+    "Content-Type: application/json; charset=utf-8\r\n"
+    "Access-Control-Allow-Origin: *\r\n"
+    "Content-Length: {length}\r\n"
+    "{connection}\r\n"
+)
+
 def _json(h: BaseHTTPRequestHandler, status=200, body=None):
-    data = json.dumps(body or {}, ensure_ascii=False).encode("utf-8")
-    h.send_response(status)
-    h.send_header("Content-Type", "application/json; charset=utf-8")
-    h.send_header("Access-Control-Allow-Origin", "*")
-    h.send_header("Content-Length", str(len(data)))
-    h.end_headers()
-    h.wfile.write(data)
+    # Status line, headers and body go out in one write (same headers that
+    # send_response/send_header/end_headers would produce)
+    data = _dumps(body or {})
+    h.log_request(status)
+    head = _JSON_HEAD.format(
+        proto=h.protocol_version, status=status, reason=h.responses.get(status, ("",))[0],
+        server=h.version_string(), date=h.date_time_string(), length=len(data),
+        connection="Connection: close\r\n" if h.close_connection else "",
+    )
+    h.wfile.write(head.encode("latin-1") + data)
 
 # ─────────────────────────────── [5] DB helpers ─────────────────────────────
+# One long-lived connection for the whole server instead of a connect + PRAGMA
+# round per request. sqlite3 connections are not safe for concurrent use, so
+# every use holds _CONN_LOCK (check_same_thread is off for handler threads).
+# Autocommit (isolation_level=None): reads run outside any transaction and
+# writers open their own with BEGIN IMMEDIATE, so the write lock is taken up
+# front rather than upgraded mid-transaction against the SRS worker.
+_CONN: sqlite3.Connection | None = None
+_CONN_LOCK = threading.Lock()
+_ATTEMPTS_HAS_SOURCE: bool | None = None   # schema probe, done once
+
+def _db() -> sqlite3.Connection:
+    """The shared connection, opened on first use; call with _CONN_LOCK held."""
+    global _CONN
+    if _CONN is None:
+        conn = sqlite3.connect(
+            get_db_path(), isolation_level=None, check_same_thread=False, cached_statements=256,
+        )
+        for p in PRAGMAS:
+            conn.execute(f"PRAGMA {p}")
+        _CONN = conn
+    return _CONN
+
 def _ensure_user(conn):
     conn.execute("INSERT OR IGNORE INTO users(id, username) VALUES (1, ?)", (USERNAME,))
 
 def _insert_attempt(conn, puzzle_id: str, result: str):
+    global _ATTEMPTS_HAS_SOURCE
     iso = datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
-    cols = [r[1] for r in conn.execute("PRAGMA table_info(attempts)").fetchall()]
-    if "source" in cols:
+    result = result.lower()   # stored lower-case (as sync_attempts does) so lookups use result=?
+    if _ATTEMPTS_HAS_SOURCE is None:
+        _ATTEMPTS_HAS_SOURCE = "source" in {r[1] for r in conn.execute("PRAGMA table_info(attempts)")}
+    if _ATTEMPTS_HAS_SOURCE:
         conn.execute(
             "INSERT INTO attempts(user_id,puzzle_id,attempted_at,result,time_ms,puzzle_rating_after,source) "
             "VALUES (1, ?, ?, ?, NULL, NULL, 'local')",
@@ -92,156 +149,249 @@ def _insert_attempt(conn, puzzle_id: str, result: str):
             (puzzle_id, iso, result),
         )
 
+# Same definitions as schema.sql; ensured on startup for databases created
+# before these indexes existed (queue joins + dedup lookups seek on them).
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_attempts_user_puzzle_time ON attempts(user_id, puzzle_id, attempted_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_srs_user_due ON srs(user_id, due_date)",
+)
+
+def _ensure_indexes(conn):
+    for ddl in _INDEXES:
+        conn.execute(ddl)
+
 def _dedup_recent(conn, puzzle_id: str, result: str) -> bool:
     """
     Return True if a same (puzzle_id, result) attempt exists within LOCAL_LOG_DEDUP_SECONDS.
     """
     if LOCAL_LOG_DEDUP_SECONDS <= 0:
         return False
+    # attempted_at is UTC ISO-8601 text: "...T09:38:53Z" from _insert_attempt,
+    # "...T09:38:53.123000Z" from sync_attempts. A suffix-free cutoff
+    # ("...T09:38:53") sorts below both forms of its second, so the index seek
+    # keeps every candidate; the exact (strict) age check is done on the one
+    # newest row in Python.
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(seconds=LOCAL_LOG_DEDUP_SECONDS)).strftime("%Y-%m-%dT%H:%M:%S")
     sql = """
       SELECT attempted_at
       FROM attempts
-      WHERE user_id=1 AND puzzle_id=? AND lower(result)=lower(?)
+      WHERE user_id=1 AND puzzle_id=? AND result=? AND attempted_at >= ?
       ORDER BY attempted_at DESC
       LIMIT 1
     """
-    row = conn.execute(sql, (puzzle_id, result)).fetchone()
+    row = conn.execute(sql, (puzzle_id, result.lower(), cutoff)).fetchone()
     if not row:
         return False
     try:
-        last = datetime.fromisoformat(row[0].replace("Z","+00:00"))
-    except Exception:
+        last = datetime.fromisoformat(row[0].replace("Z", "+00:00"))
+    except ValueError:
         return False
-    delta = datetime.now(timezone.utc) - (last if last.tzinfo else last.replace(tzinfo=timezone.utc))
-    return delta.total_seconds() < LOCAL_LOG_DEDUP_SECONDS
+    if last.tzinfo is None:
+        last = last.replace(tzinfo=timezone.utc)
+    return (now - last).total_seconds() < LOCAL_LOG_DEDUP_SECONDS
 
 # ─────────────────────────── [6] Recompute SRS (tolerant) ──────────────────
-def _recompute_srs_single(puzzle_id: str | None):
+def _bind_compute_run():
     """
-    Recompute SRS after a log. Prefer the modern signature:
-        run(changed_pids=[pid])
-    but gracefully fall back to older variants used earlier in this project.
+    Pick the compute_srs.run call shape once, at import. Prefer the modern
+    signature run(changed_pids=[...]) but keep the older variants used
+    earlier in this project: run(engine, pids), run(pids) and run().
     """
     if not _compute:
-        return
-
-    # Newest API: run(changed_pids=[...])
+        return None
+    run = _compute.run
     try:
-        _compute.run(changed_pids=[puzzle_id] if puzzle_id else None)
+        params = inspect.signature(run).parameters
+    except (TypeError, ValueError):
+        return lambda pids: run(changed_pids=pids or None)
+    if "changed_pids" in params:
+        return lambda pids: run(changed_pids=pids or None)
+    positional = [p for p in params.values() if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+    if len(positional) >= 2:
+        return lambda pids: run(None, pids or None)
+    if positional:
+        return lambda pids: run(pids or None)
+    return lambda pids: run()
+
+_RUN = _bind_compute_run()
+
+def _recompute_srs(pids: list[str] | None):
+    """Recompute SRS for the given puzzles (no-op without compute_srs)."""
+    if _RUN:
+        _RUN(pids)
+
+# /log only queues the pid; one daemon worker drains the queue and folds
+# everything logged meanwhile into a single run(changed_pids=[...]).
+# Items are marked done only after their run, so main() can wait for
+# pending recomputes on Ctrl-C instead of dropping them with the thread.
+_SRS_Q: "queue.Queue[str]" = queue.Queue()
+_SRS_WORKER: threading.Thread | None = None
+_SRS_WORKER_LOCK = threading.Lock()
+
+def _srs_worker():
+    while True:
+        pids = {_SRS_Q.get()}
+        taken = 1
+        while True:
+            try:
+                pids.add(_SRS_Q.get_nowait())
+                taken += 1
+            except queue.Empty:
+                break
+        try:
+            _recompute_srs(sorted(pids))
+        except Exception as e:
+            print("[srs] ERROR:\n" + "".join(traceback.format_exception(e)))
+        finally:
+            for _ in range(taken):
+                _SRS_Q.task_done()
+
+def _queue_srs_recompute(puzzle_id: str):
+    """Hand a logged pid to the background worker (started on first use)."""
+    global _SRS_WORKER
+    if not _compute:
         return
-    except TypeError:
-        pass
+    with _SRS_WORKER_LOCK:
+        if _SRS_WORKER is None:
+            _SRS_WORKER = threading.Thread(target=_srs_worker, name="srs-recompute", daemon=True)
+            _SRS_WORKER.start()
+    _SRS_Q.put(puzzle_id)
 
-    # Older variants used in this repo (keep these for compatibility):
-    try:
-        _compute.run(None, [puzzle_id] if puzzle_id else None)
-        return
-    except Exception:
-        pass
-    try:
-        _compute.run([puzzle_id] if puzzle_id else None)
-        return
-    except Exception:
-        pass
-    try:
-        _compute.run()
-    except Exception:
-        pass
 # ─────────────────────────────── [7] Query due rows ────────────────────────
-def _due_rows(limit=2000):
-    """
-    Load the queue with optional filters:
-      - INCLUDE_OVERDUE
-      - HIDE_TODAY_DONE
-      - QUEUE_CAP (applied last)
-    """
+def _build_due_sql(include_overdue: bool, hide_today_done: bool) -> str:
     where = []
     where.append("s.user_id=1")
-    if INCLUDE_OVERDUE:
-        where.append("s.due_date <= date('now','localtime')")
+    if include_overdue:
+        where.append("s.due_date <= :today")
     else:
-        where.append("s.due_date = date('now','localtime')")
-    # hide items already attempted today (any result)
-    if HIDE_TODAY_DONE:
-        where.append("""
-          NOT EXISTS (
-            SELECT 1 FROM attempts a
-            WHERE a.user_id=1
-              AND a.puzzle_id = s.puzzle_id
-              AND date(a.attempted_at) = date('now','localtime')
-          )
-        """)
-    sql = f"""
+        where.append("s.due_date = :today")
+    # attempts are joined once and grouped per puzzle (no per-row subqueries);
+    # hiding items already attempted today (any result) becomes a HAVING
+    having = ""
+    if hide_today_done:
+        having = "HAVING SUM(CASE WHEN date(a.attempted_at) = :today THEN 1 ELSE 0 END) = 0"
+    return f"""
       SELECT s.puzzle_id, p.themes, s.due_date,
-             (SELECT COUNT(*) FROM attempts a WHERE a.user_id=1 AND a.puzzle_id=s.puzzle_id) AS attempts,
-             (SELECT MAX(a.attempted_at) FROM attempts a WHERE a.user_id=1 AND a.puzzle_id=s.puzzle_id) AS last_attempt
+             COUNT(a.attempted_at) AS attempts,
+             MAX(a.attempted_at) AS last_attempt
       FROM srs s
       JOIN puzzles p ON p.puzzle_id = s.puzzle_id
+      LEFT JOIN attempts a ON a.user_id=1 AND a.puzzle_id = s.puzzle_id
       WHERE {' AND '.join(where)}
+      GROUP BY s.puzzle_id
+      {having}
       ORDER BY s.due_date, s.puzzle_id
-      LIMIT ?
+      LIMIT :cap
     """
-    cap = max(1, min(QUEUE_CAP or 2000, 2000))
-    with open_sqlite() as conn:
-        return conn.execute(sql, (cap,)).fetchall()
 
-# ─────────────────────────────── [8] HTML builder ──────────────────────────
-def _queue_html():
-    try:
-        # Build items from DB
-        raw = _due_rows(limit=2000)
-        items = [{
-            "puzzle_id": pid,
-            "themes": (themes or ""),
-            "attempts": int(attempts or 0),
-            "last": last or "",
-            "due": due or ""
-        } for (pid, themes, due, attempts, last) in raw]
-
-        # Official-like labels (subset you actually see in your data)
-        THEME_MAP = {
-            # Phases
-            "opening": "Opening",
-            "middlegame": "Middlegame",
-            "endgame": "Endgame",
-            "rookEndgame": "Rook endgame",
-            "bishopEndgame": "Bishop endgame",
-            "pawnEndgame": "Pawn endgame",
-            "knightEndgame": "Knight endgame",
-            "queenEndgame": "Queen endgame",
-            "queenRookEndgame": "Queen and Rook",
-            # Motifs (popular)
-            "pin": "Pin", "fork": "Fork", "skewer": "Skewer",
-            "clearance": "Clearance", "deflection": "Deflection",
-            "discoveredAttack": "Discovered attack",
-            "hangingPiece": "Hanging piece",
-            "kingsideAttack": "Kingside attack", "queensideAttack": "Queenside attack",
-            "exposedKing": "Exposed king",
-            # Mates (common)
-            "checkmate": "Checkmate",
-            "mateIn1": "Mate in 1", "mateIn2": "Mate in 2", "mateIn3": "Mate in 3", "mateIn4": "Mate in 4",
-            "backRankMate": "Back rank mate", "smotheredMate": "Smothered mate",
-            # Lengths/Goals
-            "oneMove": "One-move puzzle", "short": "Short puzzle", "long": "Long puzzle",
-            "advantage": "Advantage", "crushing": "Crushing", "equality": "Equality",
-        }
-
-        # Collect keys present
-        present_keys = set()
-        for it in items:
-            for t in (it["themes"] or "").replace(",", " ").split():
-                if t in THEME_MAP:
-                    present_keys.add(t)
-
-        theme_options = sorted(
-            ({"key": k, "label": THEME_MAP[k]} for k in present_keys),
-            key=lambda d: d["label"].lower()
-        )
+# The SQL only depends on the two flags: build every variant once at import
+_DUE_SQL = {
+    (inc, hide): _build_due_sql(inc, hide)
+    for inc in (True, False) for hide in (True, False)
+}
 
-        payload = json.dumps({"items": items, "themes": theme_options, "themeLabels": THEME_MAP}, ensure_ascii=False)
+def _due_rows(limit=2000):
+    """
+    Load the queue with optional filters:
+      - INCLUDE_OVERDUE
+      - HIDE_TODAY_DONE
+      - QUEUE_CAP (applied last)
+    """
+    sql = _DUE_SQL[(bool(INCLUDE_OVERDUE), bool(HIDE_TODAY_DONE))]
+    cap = max(1, min(QUEUE_CAP or 2000, 2000))
+    # local "today" computed once here instead of date('now','localtime') per row
+    params = {"today": date.today().isoformat(), "cap": cap}
+    with _CONN_LOCK:
+        return _db().execute(sql, params).fetchall()
 
-        # Raw string with placeholders; replaced at the end
-        html = r"""<!doctype html>
+# ─────────────────────────────── [8] HTML builder ──────────────────────────
+# Official Lichess themes → nice labels (for dropdown + per-card); only the
+# {key,label} pairs present in the queue are shipped to the page
+THEME_MAP = {
+    # Phases
+    "opening": "Opening",
+    "middlegame": "Middlegame",
+    "endgame": "Endgame",
+    "rookEndgame": "Rook endgame",
+    "bishopEndgame": "Bishop endgame",
+    "pawnEndgame": "Pawn endgame",
+    "knightEndgame": "Knight endgame",
+    "queenEndgame": "Queen endgame",
+    "queenRookEndgame": "Queen and Rook",
+
+    # Motifs
+    "advancedPawn": "Advanced pawn",
+    "attackingF2F7": "Attacking f2 or f7",
+    "captureDefender": "Capture the defender",
+    "discoveredAttack": "Discovered attack",
+    "doubleCheck": "Double check",
+    "exposedKing": "Exposed king",
+    "fork": "Fork",
+    "hangingPiece": "Hanging piece",
+    "kingsideAttack": "Kingside attack",
+    "queensideAttack": "Queenside attack",
+    "pin": "Pin",
+    "sacrifice": "Sacrifice",
+    "skewer": "Skewer",
+    "trappedPiece": "Trapped piece",
+
+    # Advanced
+    "attraction": "Attraction",
+    "clearance": "Clearance",
+    "defensiveMove": "Defensive move",
+    "deflection": "Deflection",
+    "interference": "Interference",
+    "intermezzo": "Intermezzo",
+    "quietMove": "Quiet move",
+    "xRayAttack": "X-Ray attack",
+    "zugzwang": "Zugzwang",
+
+    # Mates
+    "checkmate": "Checkmate",
+    "mateIn1": "Mate in 1",
+    "mateIn2": "Mate in 2",
+    "mateIn3": "Mate in 3",
+    "mateIn4": "Mate in 4",
+    "mateIn5": "Mate in 5 or more",
+    "arabianMate": "Arabian mate",
+    "anastasiaMate": "Anastasia's mate",
+    "backRankMate": "Back rank mate",
+    "bodenMate": "Boden's mate",
+    "doubleBishopMate": "Double bishop mate",
+    "dovetailMate": "Dovetail mate",
+    "hookMate": "Hook mate",
+    "killBoxMate": "Kill box mate",
+    "smotheredMate": "Smothered mate",
+    "vukovicMate": "Vukovic mate",
+
+    # Special moves
+    "castling": "Castling",
+    "enPassant": "En passant",
+    "promotion": "Promotion",
+    "underPromotion": "Underpromotion",
+
+    # Goals
+    "equality": "Equality",
+    "advantage": "Advantage",
+    "crushing": "Crushing",
+
+    # Lengths
+    "oneMove": "One-move puzzle",
+    "short": "Short puzzle",
+    "long": "Long puzzle",
+    "veryLong": "Very long puzzle",
+
+    # Origin
+    "master": "Master games",
+    "superGM": "Super GM games",
+    "playerGames": "Player games",
+}
+
+# Page shell as a raw string with placeholders (avoids JS ${} issues). The
+# __INCLUDE__/__PORT__ values are fixed per process, so they are filled in once
+# and the shell is split around __PAYLOAD__; a request only concatenates.
+_QUEUE_TEMPLATE = r"""<!doctype html>
 <html lang="en"><head>
 <meta charset="utf-8"/><meta name="viewport" content="width=device-width, initial-scale=1"/>
 <title>Queue — Lichess Puzzles</title>
@@ -363,10 +513,15 @@ hr { border:none; border-top:1px solid var(--border); margin:12px 0; }
 
 <script>
 // [H-4] Client data boot
-const DATA = __PAYLOAD__; // { items: [...], themes: [{key,label}], themeLabels: {key:label} }
+const DATA = __PAYLOAD__; // { items: [...], themes: [{key,label}] }
 let items = DATA.items || [];
 const allThemes = DATA.themes || [];
-const THEME_LABELS = DATA.themeLabels || {};
+const THEME_LABELS = new Map(allThemes.map(t => [t.key, t.label]));
+// Split each item's theme string once: ordered keys for the card, a Set for filtering
+for (const x of DATA.items || []) {
+  x._themeKeys = (x.themes || "").split(/[ ,]+/).filter(Boolean);
+  x._themeSet = new Set(x._themeKeys);
+}
 
 // [H-5] Local state & today stats
 const $ = (id) => document.getElementById(id);
@@ -374,9 +529,15 @@ let idx = parseInt(localStorage.getItem("queue_idx") || "0", 10);
 if (isNaN(idx) || idx < 0) idx = 0;
 if (idx >= items.length) idx = 0;
 
+// The key only changes at local midnight: format it once per day and let
+// later calls (every bump/render) cost one Date.now() comparison
+let dayKeyCache = "", dayKeyUntil = 0;
 function dayKey() {
+  if (Date.now() < dayKeyUntil) return dayKeyCache;
   const d = new Date();
-  return d.getFullYear()+"-"+String(d.getMonth()+1).padStart(2,'0')+"-"+String(d.getDate()).padStart(2,'0');
+  dayKeyCache = d.getFullYear()+"-"+String(d.getMonth()+1).padStart(2,'0')+"-"+String(d.getDate()).padStart(2,'0');
+  dayKeyUntil = new Date(d.getFullYear(), d.getMonth(), d.getDate() + 1).getTime();
+  return dayKeyCache;
 }
 let statsDay = localStorage.getItem("queue_stats_daykey") || dayKey();
 let stats = JSON.parse(localStorage.getItem("queue_stats_today") || '{}');
@@ -384,14 +545,30 @@ if (!stats || typeof stats !== "object") stats = {win:0, loss:0};
 if (typeof stats.win !== "number") stats.win = 0;
 if (typeof stats.loss !== "number") stats.loss = 0;
 
+// localStorage is synchronous: writes are coalesced and flushed at most once
+// per 100 ms (holding n/p no longer writes per keypress), and on page exit
+let pendingIdx = null, pendingStats = false, writeTimer = null;
+function flushWrites() {
+  if (writeTimer) { clearTimeout(writeTimer); writeTimer = null; }
+  if (pendingIdx !== null) localStorage.setItem("queue_idx", pendingIdx);
+  if (pendingStats) {
+    localStorage.setItem("queue_stats_today", JSON.stringify(stats));
+    localStorage.setItem("queue_stats_daykey", statsDay);
+  }
+  pendingIdx = null; pendingStats = false;
+}
+function scheduleWrite() {
+  if (!writeTimer) writeTimer = setTimeout(flushWrites, 100);
+}
+function saveIdx() { pendingIdx = String(idx); scheduleWrite(); }
+window.addEventListener("beforeunload", flushWrites);
+window.addEventListener("pagehide", flushWrites);
+
 function ensureToday() {
   const k = dayKey();
   if (k !== statsDay) { stats = {win:0, loss:0}; statsDay = k; saveStats(); }
 }
-function saveStats() {
-  localStorage.setItem("queue_stats_today", JSON.stringify(stats));
-  localStorage.setItem("queue_stats_daykey", statsDay);
-}
+function saveStats() { pendingStats = true; scheduleWrite(); }
 function bump(result) {
   ensureToday();
   if (result === "win") stats.win++; else if (result === "loss") stats.loss++;
@@ -411,16 +588,17 @@ const themeSel = $("themeSel");
 
 function filterByTheme(themeKey) {
   if (!themeKey) return;
-  items = DATA.items.filter(x => (x.themes || "").split(/[ ,]+/).includes(themeKey));
+  items = DATA.items.filter(x => x._themeSet.has(themeKey));
   idx = 0;
-  localStorage.setItem("queue_idx", "0");
+  saveIdx();
   render();
 }
+
 themeSel.addEventListener("change", (e) => {
   const key = e.target.value || "";
   if (!key) {
     items = DATA.items.slice();
-    idx = 0; localStorage.setItem("queue_idx", "0");
+    idx = 0; saveIdx();
     render();
   } else {
     filterByTheme(key);
@@ -442,18 +620,25 @@ function fmt(ts) {
            pad(d.getHours())+":"+pad(d.getMinutes())+":"+pad(d.getSeconds());
   } catch(e) { return ts; }
 }
-function firstThemes(csv) {
-  if (!csv) return "";
-  return csv
-    .split(/[ ,]+/)
-    .filter(Boolean)
-    .map(k => THEME_LABELS[k] || k)
+// Show first 4 themes, using official labels
+function firstThemes(keys) {
+  return keys
     .slice(0, 4)
+    .map(k => THEME_LABELS.get(k) || k)
     .join(", ");
 }
 function url(pid) { return "https://lichess.org/training/" + pid; }
 
+// Every action calls render(); the DOM writes are coalesced into one pass
+// per animation frame (win = bump + remove + render would otherwise be three)
+let renderPending = false;
 function render() {
+  if (renderPending) return;
+  renderPending = true;
+  requestAnimationFrame(() => { renderPending = false; renderNow(); });
+}
+
+function renderNow() {
   ensureToday();
   todayEl.textContent = "Today: " + (stats.win||0) + " win / " + (stats.loss||0) + " loss";
   metaEl.textContent = items.length ? ("Showing " + (idx+1) + " of " + items.length) : "Showing 0 of 0";
@@ -466,7 +651,8 @@ function render() {
   }
   const x = items[idx];
   pidEl.textContent = x.puzzle_id;
-  themesEl.textContent = firstThemes(x.themes);
+  if (x._themeLabel === undefined) x._themeLabel = firstThemes(x._themeKeys);   // memoized per item
+  themesEl.textContent = x._themeLabel;
   attemptsEl.textContent = String(x.attempts||0);
   lastEl.textContent = fmt(x.last);
   dueEl.textContent = x.due || "—";
@@ -477,7 +663,7 @@ function render() {
 function step(delta) {
   if (!items.length) return;
   idx = Math.max(0, Math.min(items.length-1, idx + delta));
-  localStorage.setItem("queue_idx", String(idx));
+  saveIdx();
   render();
 }
 
@@ -485,7 +671,7 @@ function removeCurrent() {
   if (!items.length) return;
   items.splice(idx, 1);
   if (idx >= items.length) idx = Math.max(0, items.length-1);
-  localStorage.setItem("queue_idx", String(idx));
+  saveIdx();
 }
 
 function openCurrent() {
@@ -498,7 +684,10 @@ function log(result) {
   const id = items[idx].puzzle_id;
   const u = "http://127.0.0.1:__PORT__/log?puzzle_id="+encodeURIComponent(id)+"&result="+encodeURIComponent(result);
   fetch(u).then(r => r.json()).then(j => {
-    if (j && j.ok) {
+    if (j && j.ok && j.deduped) {
+      msgEl.className = "kv notice-ok";
+      msgEl.textContent = "Already logged " + result;
+    } else if (j && j.ok) {
       msgEl.className = "kv notice-ok";
       msgEl.textContent = "Logged " + result + " ✓";
       bump(result);
@@ -520,7 +709,7 @@ $("win").onclick  = () => log("win");
 $("loss").onclick = () => log("loss");
 $("skip").onclick = () => { step(+1); };
 $("prev").onclick = () => { step(-1); };
-$("resetIdx").onclick = () => { idx = 0; localStorage.setItem("queue_idx","0"); render(); };
+$("resetIdx").onclick = () => { idx = 0; saveIdx(); render(); };
 $("resetStats").onclick = () => {
   stats = {win:0, loss:0}; statsDay = dayKey(); saveStats(); render();
 };
@@ -539,456 +728,100 @@ render();
 </script>
 </body></html>
 """
-        return (
-            html
-            .replace("__INCLUDE__", "yes" if INCLUDE_OVERDUE else "no")
-            .replace("__PORT__", str(PORT))
-            .replace("__PAYLOAD__", payload)
-        )
-    except Exception as e:
-        print("[/queue] ERROR:\n" + "".join(traceback.format_exception(e)))
-        safe = (
-            "<!doctype html><meta charset='utf-8'>"
-            "<style>body{font:14px -apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,Arial}</style>"
-            "<h1>Queue error</h1>"
-            "<p>See the terminal for details.</p>"
-        )
-        return safe
+_QUEUE_HEAD, _QUEUE_TAIL = (
+    _QUEUE_TEMPLATE
+    .replace("__INCLUDE__", "yes" if INCLUDE_OVERDUE else "no")
+    .replace("__PORT__", str(PORT))
+    .split("__PAYLOAD__", 1)
+)
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+_ITEM_JSON = '{"puzzle_id":%s,"themes":%s,"attempts":%d,"last":%s,"due":%s}'
+_jstr = json.encoder.encode_basestring   # JSON string literal, non-ASCII kept as-is
+
+# Dropdown options: [{key, label}], sorted by label. They depend only on which
+# keys are present, which rarely changes between rebuilds: memoize the JSON.
+@lru_cache(maxsize=64)
+def _theme_options_json(keys: frozenset) -> str:
+    options = sorted(
+        ({"key": k, "label": THEME_MAP[k]} for k in keys),
+        key=lambda d: d["label"].lower()
+    )
+    return _dumps(options).decode("utf-8")
 
-# ─────────────────────────────── [9] HTML builder ──────────────────────────
 def _queue_html():
     try:
-        # Build items from DB
+        # Build the items JSON straight from the DB rows (no per-row dicts)
         raw = _due_rows(limit=2000)
-        items = [{
-            "puzzle_id": pid,
-            "themes": (themes or ""),
-            "attempts": int(attempts or 0),
-            "last": last or "",
-            "due": due or ""
-        } for (pid, themes, due, attempts, last) in raw]
-
-        # ───────── Official Lichess themes → nice labels (for dropdown + per-card) ─────────
-        THEME_MAP = {
-            # Phases
-            "opening": "Opening",
-            "middlegame": "Middlegame",
-            "endgame": "Endgame",
-            "rookEndgame": "Rook endgame",
-            "bishopEndgame": "Bishop endgame",
-            "pawnEndgame": "Pawn endgame",
-            "knightEndgame": "Knight endgame",
-            "queenEndgame": "Queen endgame",
-            "queenRookEndgame": "Queen and Rook",
-
-            # Motifs
-            "advancedPawn": "Advanced pawn",
-            "attackingF2F7": "Attacking f2 or f7",
-            "captureDefender": "Capture the defender",
-            "discoveredAttack": "Discovered attack",
-            "doubleCheck": "Double check",
-            "exposedKing": "Exposed king",
-            "fork": "Fork",
-            "hangingPiece": "Hanging piece",
-            "kingsideAttack": "Kingside attack",
-            "queensideAttack": "Queenside attack",
-            "pin": "Pin",
-            "sacrifice": "Sacrifice",
-            "skewer": "Skewer",
-            "trappedPiece": "Trapped piece",
-
-            # Advanced
-            "attraction": "Attraction",
-            "clearance": "Clearance",
-            "defensiveMove": "Defensive move",
-            "deflection": "Deflection",
-            "interference": "Interference",
-            "intermezzo": "Intermezzo",
-            "quietMove": "Quiet move",
-            "xRayAttack": "X-Ray attack",
-            "zugzwang": "Zugzwang",
-
-            # Mates
-            "checkmate": "Checkmate",
-            "mateIn1": "Mate in 1",
-            "mateIn2": "Mate in 2",
-            "mateIn3": "Mate in 3",
-            "mateIn4": "Mate in 4",
-            "mateIn5": "Mate in 5 or more",
-            "arabianMate": "Arabian mate",
-            "anastasiaMate": "Anastasia's mate",
-            "backRankMate": "Back rank mate",
-            "bodenMate": "Boden's mate",
-            "doubleBishopMate": "Double bishop mate",
-            "dovetailMate": "Dovetail mate",
-            "hookMate": "Hook mate",
-            "killBoxMate": "Kill box mate",
-            "smotheredMate": "Smothered mate",
-            "vukovicMate": "Vukovic mate",
-
-            # Special moves
-            "castling": "Castling",
-            "enPassant": "En passant",
-            "promotion": "Promotion",
-            "underPromotion": "Underpromotion",
-
-            # Goals
-            "equality": "Equality",
-            "advantage": "Advantage",
-            "crushing": "Crushing",
-
-            # Lengths
-            "oneMove": "One-move puzzle",
-            "short": "Short puzzle",
-            "long": "Long puzzle",
-            "veryLong": "Very long puzzle",
-
-            # Origin
-            "master": "Master games",
-            "superGM": "Super GM games",
-            "playerGames": "Player games",
-        }
+        items_json = "[" + ",".join(
+            _ITEM_JSON % (_jstr(pid), _jstr(themes or ""), int(attempts or 0), _jstr(last or ""), _jstr(due or ""))
+            for (pid, themes, due, attempts, last) in raw
+        ) + "]"
 
         # Collect only the official theme KEYS present in your data (prevents empty options)
-        present_keys = set()
-        for it in items:
-            for t in (it["themes"] or "").replace(",", " ").split():
-                if t in THEME_MAP:
-                    present_keys.add(t)
-
-        # Dropdown options: [{key, label}], sorted by label
-        theme_options = sorted(
-            ({"key": k, "label": THEME_MAP[k]} for k in present_keys),
-            key=lambda d: d["label"].lower()
-        )
-
-        # Include THEME_MAP so client can render nice names inside the card
-        payload = json.dumps(
-            {"items": items, "themes": theme_options, "themeLabels": THEME_MAP},
-            ensure_ascii=False
-        )
-
-        # IMPORTANT: raw string with placeholders; we .replace(...) at the end (avoid JS ${} issues)
-        html = r"""<!doctype html>
-<html lang="en"><head>
-<meta charset="utf-8"/><meta name="viewport" content="width=device-width, initial-scale=1"/>
-<title>Queue — Lichess Puzzles</title>
-
-<!-- [H-1] Styles -->
-<style>
-:root {
-  --bg: #f6f7fb; --fg: #0f172a; --muted:#64748b; --border:#e2e8f0; --card:#ffffff;
-  --row:#f8fafc; --accent:#2563eb; --danger:#ef4444; --ok:#16a34a; --open:#22c55e;
-}
-* { box-sizing:border-box; }
-body {
-  margin:0; color:var(--fg);
-  font:14px/1.6 -apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,Arial,"Noto Sans";
-  background: linear-gradient(180deg, #eef2ff 0%, #f6f7fb 30%, #ffffff 100%);
-}
-.wrap { max-width:860px; margin:0 auto; padding:24px; }
-h1 { margin:0 0 10px; font-size:24px; letter-spacing:.2px; }
-.sub { color:var(--muted); font-size:12px; }
-
-.toolbar { display:flex; gap:12px; align-items:center; flex-wrap:wrap; margin:14px 0 18px; }
-.toolbar .stat { background:#ffffffaa; border:1px solid var(--border); border-radius:999px; padding:6px 10px; }
-
-select, button {
-  padding:10px 12px; border:1px solid var(--border); border-radius:10px; background:#fff;
-  cursor:pointer; transition:filter .12s ease, transform .12s ease;
-}
-button:hover { filter:brightness(1.05); transform: translateY(-1px); }
-
-button.primary { background:var(--accent); color:#fff; border-color:var(--accent); }
-button.primary:hover { background:var(--accent); filter:brightness(1.1); }
-
-button.danger  { background:var(--danger); color:#fff; border-color:var(--danger); }
-button.danger:hover  { background:var(--danger); filter:brightness(1.1); }
-
-button.openbtn { background:var(--open); color:#fff; border-color:var(--open); }
-button.openbtn:hover { background:var(--open); filter:brightness(1.1); }
-
-button.ghost   { background:#f1f5f9; color:var(--fg); border-color:var(--border); }
-button.ghost:hover { background:#e2e8f0; }
-
-.card {
-  border:1px solid var(--border); background:var(--card); border-radius:16px; padding:18px;
-  box-shadow: 0 8px 24px rgba(15, 23, 42, .06);
-}
-.topline { display:flex; align-items:center; justify-content:space-between; gap:8px; }
-.badge { display:inline-block; background:#eef2ff; padding:2px 8px; border-radius:999px; font-size:12px; }
-.kv { color:var(--muted); font-size:12px; }
-
-.meta { display:grid; grid-template-columns: 1fr 1fr; gap:8px; margin:10px 0 2px; }
-.meta .box { background:var(--row); border:1px solid var(--border); border-radius:10px; padding:8px 10px; min-height:40px; }
-.meta .label { font-size:11px; color:var(--muted); margin-bottom:2px; }
-
-.actions { display:flex; gap:10px; flex-wrap:wrap; margin-top:12px; }
-.notice-ok { color:var(--ok); font-weight:600; }
-.notice-err { color:var(--danger); font-weight:600; }
-hr { border:none; border-top:1px solid var(--border); margin:12px 0; }
-.small { font-size:12px; color:var(--muted); }
-</style>
-</head>
-<body>
-<div class="wrap">
-  <h1>Due Queue</h1>
-  <div class="sub">Includes overdue: <strong>__INCLUDE__</strong></div>
+        # (one regex scan over all theme strings; keys are plain alphanumerics)
+        present_keys = THEME_MAP.keys() & set(_TOKEN_RE.findall(" ".join(r[1] or "" for r in raw)))
 
-  <!-- [H-2] Toolbar -->
-  <div class="toolbar">
-    <label class="kv">Theme
-      <select id="themeSel">
-        <option value="">All themes</option>
-      </select>
-    </label>
-    <button class="ghost" id="resetIdx">Reset position</button>
-    <button class="ghost" id="resetStats">Reset today</button>
-    <span class="stat" id="today">Today: 0 win / 0 loss</span>
-    <span class="kv" id="meta"></span>
-  </div>
-
-  <!-- [H-3] Card (single puzzle view) -->
-  <div class="card">
-    <div class="topline">
-      <div>
-        <strong id="pid">—</strong>
-        <span class="badge" id="due">—</span>
-      </div>
-      <div class="kv" id="msg"></div>
-    </div>
 
-    <div class="meta">
-      <div class="box">
-        <div class="label">Themes</div>
-        <div id="themes">—</div>
-      </div>
-      <div class="box">
-        <div class="label">Attempts</div>
-        <div><span id="attempts">0</span></div>
-      </div>
-      <div class="box">
-        <div class="label">Last Attempt</div>
-        <div id="last">—</div>
-      </div>
-      <div class="box">
-        <div class="label">Next Due</div>
-        <div id="due2">—</div>
-      </div>
-    </div>
+        # The card resolves its theme labels from the same options list
+        payload = '{"items":' + items_json + ',"themes":' + _theme_options_json(frozenset(present_keys)) + "}"
 
-    <hr/>
-    <div class="actions">
-      <button id="prev">Prev (P)</button>
-      <button class="openbtn" id="open">Open (O)</button>
-      <button class="primary" id="win">Win (W)</button>
-      <button class="danger" id="loss">Loss (L)</button>
-      <button id="skip">Skip (N)</button>
-    </div>
-    <div class="small" style="margin-top:6px;">Keyboard: O open • W win • L loss • N skip • P prev</div>
-  </div>
-</div>
-
-<script>
-// [H-4] Client data boot
-const DATA = __PAYLOAD__; // { items: [...], themes: [{key,label}], themeLabels: {key:label} }
-let items = DATA.items || [];
-const allThemes = DATA.themes || [];
-const THEME_LABELS = DATA.themeLabels || {};
-
-// [H-5] Local state & today stats
-const $ = (id) => document.getElementById(id);
-let idx = parseInt(localStorage.getItem("queue_idx") || "0", 10);
-if (isNaN(idx) || idx < 0) idx = 0;
-if (idx >= items.length) idx = 0;
-
-function dayKey() {
-  const d = new Date();
-  return d.getFullYear()+"-"+String(d.getMonth()+1).padStart(2,'0')+"-"+String(d.getDate()).padStart(2,'0');
-}
-let statsDay = localStorage.getItem("queue_stats_daykey") || dayKey();
-let stats = JSON.parse(localStorage.getItem("queue_stats_today") || '{}');
-if (!stats || typeof stats !== "object") stats = {win:0, loss:0};
-if (typeof stats.win !== "number") stats.win = 0;
-if (typeof stats.loss !== "number") stats.loss = 0;
-
-function ensureToday() {
-  const k = dayKey();
-  if (k !== statsDay) { stats = {win:0, loss:0}; statsDay = k; saveStats(); }
-}
-function saveStats() {
-  localStorage.setItem("queue_stats_today", JSON.stringify(stats));
-  localStorage.setItem("queue_stats_daykey", statsDay);
-}
-function bump(result) {
-  ensureToday();
-  if (result === "win") stats.win++; else if (result === "loss") stats.loss++;
-  saveStats(); render();
-}
-
-// [H-6] Theme filter (official labels)
-const themeSel = $("themeSel");
-(function fillThemes() {
-  for (const opt of allThemes) {
-    const el = document.createElement("option");
-    el.value = opt.key;         // filter by KEY
-    el.textContent = opt.label; // show LABEL
-    themeSel.appendChild(el);
-  }
-})();
-
-function filterByTheme(themeKey) {
-  if (!themeKey) return;
-  items = DATA.items.filter(x => (x.themes || "").split(/[ ,]+/).includes(themeKey));
-  idx = 0;
-  localStorage.setItem("queue_idx", "0");
-  render();
-}
-
-themeSel.addEventListener("change", (e) => {
-  const key = e.target.value || "";
-  if (!key) {
-    items = DATA.items.slice();
-    idx = 0; localStorage.setItem("queue_idx", "0");
-    render();
-  } else {
-    filterByTheme(key);
-  }
-});
-
-// [H-7] Render & actions
-const pidEl = $("pid"), themesEl = $("themes"), attemptsEl = $("attempts"),
-      lastEl = $("last"), dueEl = $("due"), due2El = $("due2"),
-      metaEl = $("meta"), msgEl = $("msg"), todayEl = $("today");
-
-function pad(n) { return String(n).padStart(2,'0'); }
-function fmt(ts) {
-  if (!ts) return "—";
-  try {
-    const d = new Date(ts);
-    if (isNaN(d)) return ts;
-    return d.getFullYear()+"-"+pad(d.getMonth()+1)+"-"+pad(d.getDate())+" "+
-           pad(d.getHours())+":"+pad(d.getMinutes())+":"+pad(d.getSeconds());
-  } catch(e) { return ts; }
-}
-// Show first 4 themes, using official labels
-function firstThemes(csv) {
-  if (!csv) return "";
-  return csv
-    .split(/[ ,]+/)
-    .filter(Boolean)
-    .map(k => THEME_LABELS[k] || k)
-    .slice(0, 4)
-    .join(", ");
-}
-function url(pid) { return "https://lichess.org/training/" + pid; }
-
-function render() {
-  ensureToday();
-  todayEl.textContent = "Today: " + (stats.win||0) + " win / " + (stats.loss||0) + " loss";
-  metaEl.textContent = items.length ? ("Showing " + (idx+1) + " of " + items.length) : "Showing 0 of 0";
-
-  if (!items.length) {
-    pidEl.textContent = "—"; themesEl.textContent = "—"; attemptsEl.textContent = "0";
-    lastEl.textContent = "—"; dueEl.textContent = "—"; due2El.textContent = "—";
-    msgEl.className = "kv notice-ok"; msgEl.textContent = "🎉 All done!";
-    return;
-  }
-  const x = items[idx];
-  pidEl.textContent = x.puzzle_id;
-  themesEl.textContent = firstThemes(x.themes);
-  attemptsEl.textContent = String(x.attempts||0);
-  lastEl.textContent = fmt(x.last);
-  dueEl.textContent = x.due || "—";
-  due2El.textContent = x.due || "—";
-  msgEl.className = "kv"; msgEl.textContent = "";
-}
-
-function step(delta) {
-  if (!items.length) return;
-  idx = Math.max(0, Math.min(items.length-1, idx + delta));
-  localStorage.setItem("queue_idx", String(idx));
-  render();
-}
-
-function removeCurrent() {
-  if (!items.length) return;
-  items.splice(idx, 1);
-  if (idx >= items.length) idx = Math.max(0, items.length-1);
-  localStorage.setItem("queue_idx", String(idx));
-}
-
-function openCurrent() {
-  if (!items.length) return;
-  window.open(url(items[idx].puzzle_id), "_blank", "noopener");
-}
-
-function log(result) {
-  if (!items.length) return;
-  const id = items[idx].puzzle_id;
-  const u = "http://127.0.0.1:__PORT__/log?puzzle_id="+encodeURIComponent(id)+"&result="+encodeURIComponent(result);
-  fetch(u).then(r => r.json()).then(j => {
-    if (j && j.ok) {
-      msgEl.className = "kv notice-ok";
-      msgEl.textContent = "Logged " + result + " ✓";
-      bump(result);
-      removeCurrent();
-      render();
-    } else {
-      msgEl.className = "kv notice-err";
-      msgEl.textContent = "Log failed: " + (j && j.error ? j.error : "unknown");
-    }
-  }).catch(() => {
-    msgEl.className = "kv notice-err";
-    msgEl.textContent = "Server not running?";
-  });
-}
-
-// Buttons + keys
-$("open").onclick = openCurrent;
-$("win").onclick  = () => log("win");
-$("loss").onclick = () => log("loss");
-$("skip").onclick = () => { step(+1); };
-$("prev").onclick = () => { step(-1); };
-$("resetIdx").onclick = () => { idx = 0; localStorage.setItem("queue_idx","0"); render(); };
-$("resetStats").onclick = () => {
-  stats = {win:0, loss:0}; statsDay = dayKey(); saveStats(); render();
-};
-
-// [H-8] Keyboard bindings
-document.addEventListener("keydown", (e) => {
-  const k = (e.key||"").toLowerCase();
-  if (k === "o") openCurrent();
-  else if (k === "w") log("win");
-  else if (k === "l") log("loss");
-  else if (k === "n") step(+1);
-  else if (k === "p") step(-1);
-});
-
-render();
-</script>
-</body></html>
-"""
-        return (
-            html
-            .replace("__INCLUDE__", "yes" if INCLUDE_OVERDUE else "no")
-            .replace("__PORT__", str(PORT))
-            .replace("__PAYLOAD__", payload)
-        )
+        return _QUEUE_HEAD + payload + _QUEUE_TAIL
     except Exception as e:
         # Print full traceback to your terminal, and render a simple error page
         print("[/queue] ERROR:\n" + "".join(traceback.format_exception(e)))
-        safe = (
-            "<!doctype html><meta charset='utf-8'>"
-            "<style>body{font:14px -apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,Arial}</style>"
-            "<h1>Queue error</h1>"
-            "<p>See the terminal for details.</p>"
-        )
-        return safe
+        return _QUEUE_ERROR_HTML
 
-# ───────────────────────── [10] HTTP handler ───────────────────────────────
+_QUEUE_ERROR_HTML = (
+    "<!doctype html><meta charset='utf-8'>"
+    "<style>body{font:14px -apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,Arial}</style>"
+    "<h1>Queue error</h1>"
+    "<p>See the terminal for details.</p>"
+)
+
+# Rendered /queue cache: (key, etag, html, gzipped html). The bodies are held
+# as memoryviews over the encoded bytes, so every request writes the same
+# buffer without slicing or copying until the cache is replaced. The key is
+# bumped by /log (_QUEUE_VERSION), by commits from other connections such as
+# compute_srs or a sync (PRAGMA data_version) and by the date rolling over.
+# (A file mtime would miss commits still sitting in the WAL; data_version
+# does not.) Concurrent misses rebuild once: the rest wait on
+# _QUEUE_BUILD_LOCK and take the fresh entry.
+_QUEUE_VERSION = 0
+_QUEUE_CACHE: tuple | None = None
+_QUEUE_BUILD_LOCK = threading.Lock()
+
+def _queue_key():
+    with _CONN_LOCK:
+        return (_QUEUE_VERSION, _db().execute("PRAGMA data_version").fetchone()[0], date.today())
+
+def _queue_response():
+    """Return (etag, html, gzip) for /queue as memoryviews, rebuilt only when stale."""
+    global _QUEUE_CACHE
+    key = _queue_key()
+    cached = _QUEUE_CACHE
+    if cached and cached[0] == key:
+        return cached[1:]
+    with _QUEUE_BUILD_LOCK:
+        cached = _QUEUE_CACHE
+        if cached and cached[0] == key:
+            return cached[1:]   # built by another request while we waited
+        html = _queue_html()
+        body = html.encode("utf-8")
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        entry = (key, etag, memoryview(body), memoryview(gzip.compress(body, GZIP_LEVEL)))
+        if html is not _QUEUE_ERROR_HTML:
+            _QUEUE_CACHE = entry
+        return entry[1:]
+
+# ───────────────────────── [9] HTTP handler ────────────────────────────────
 class Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the page's /log calls on one connection; every response
+    # below carries a Content-Length (or has no body) so keep-alive is safe
+    protocol_version = "HTTP/1.1"
+
     def do_GET(self):
+        global _QUEUE_VERSION
         try:
             parsed = urlparse(self.path)
 
@@ -996,6 +829,7 @@ class Handler(BaseHTTPRequestHandler):
             if parsed.path in ("/", ""):
                 self.send_response(302)
                 self.send_header("Location", "/queue")
+                self.send_header("Content-Length", "0")
                 self.end_headers()
                 return
 
@@ -1009,12 +843,24 @@ class Handler(BaseHTTPRequestHandler):
                 return _json(self, 200, {"ok": True, "time": datetime.now().astimezone().isoformat()})
 
             if parsed.path == "/queue":
-                html = _queue_html().encode("utf-8")
+                etag, html, gz = _queue_response()
+                if etag in (self.headers.get("If-None-Match") or ""):
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                use_gz = "gzip" in (self.headers.get("Accept-Encoding") or "")
+                body = gz if use_gz else html
                 self.send_response(200)
                 self.send_header("Content-Type", "text/html; charset=utf-8")
-                self.send_header("Content-Length", str(len(html)))
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Vary", "Accept-Encoding")
+                if use_gz:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
                 self.end_headers()
-                self.wfile.write(html)
+                self.wfile.write(body)
                 return
 
             if parsed.path == "/log":
@@ -1024,16 +870,20 @@ class Handler(BaseHTTPRequestHandler):
                 if not pid or result not in ("win", "loss"):
                     return _json(self, 400, {"ok": False, "error": "need puzzle_id and result=win|loss"})
 
-                # Write attempt directly to SQLite
-                db_path = _resolve_db_path() if "_resolve_db_path" in globals() else get_db_path()
-                with sqlite3.connect(db_path) as conn:
-                    conn.execute("PRAGMA journal_mode=WAL;")
-                    conn.execute("PRAGMA synchronous=NORMAL;")
-                    _ensure_user(conn)
-                    _insert_attempt(conn, pid, result)
-                    conn.commit()
-
-                _recompute_srs_single(pid)
+                # Write attempt directly to SQLite (commits, or rolls back on error);
+                # the user row is ensured once at startup, not per keypress. A
+                # repeat of the same result within LOCAL_LOG_DEDUP_SECONDS (double
+                # press / resent request) is acknowledged but not stored again.
+                with _CONN_LOCK, _db() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    deduped = _dedup_recent(conn, pid, result)
+                    if not deduped:
+                        _insert_attempt(conn, pid, result)
+                        _QUEUE_VERSION += 1
+                if deduped:
+                    return _json(self, 200, {"ok": True, "puzzle_id": pid, "result": result, "deduped": True})
+
+                _queue_srs_recompute(pid)   # SRS catches up in the background
                 return _json(self, 200, {"ok": True, "puzzle_id": pid, "result": result})
 
             # Not found
@@ -1041,12 +891,21 @@ class Handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             print("[request] ERROR:\n" + "".join(traceback.format_exception(e)))
+            # part of a response may already be on the wire: don't reuse the
+            # keep-alive connection after this one
+            self.close_connection = True
             return _json(self, 500, {"ok": False, "error": repr(e)})
 
-# ───────────────────────────── [11] Entrypoint ─────────────────────────────
+# ───────────────────────────── [10] Entrypoint ─────────────────────────────
 def main():
+    with _CONN_LOCK, _db() as conn:
+        _ensure_user(conn)
+        _ensure_indexes(conn)
+
     try:
-        server = HTTPServer(("127.0.0.1", PORT), Handler)
+        # One thread per connection; the shared SQLite connection is guarded
+        # by _CONN_LOCK and WAL lets the SRS worker write alongside readers
+        server = ThreadingHTTPServer(("127.0.0.1", PORT), Handler)
     except OSError as e:
         # macOS: errno 48 means "Address already in use"
         if getattr(e, "errno", None) == 48:
@@ -1063,6 +922,9 @@ def main():
     try:
         server.serve_forever()
     except KeyboardInterrupt:
+        if _SRS_Q.unfinished_tasks:
+            print("\n[serve] finishing pending SRS updates...")
+            _SRS_Q.join()
         print("\n[serve] bye")
 
 if __name__ == "__main__":
@@ -1,17 +1,30 @@
 # src/stats.py
 from __future__ import annotations
+from datetime import date, datetime, time, timedelta, timezone
 from sqlite3 import Connection
 
+def _utc_bound(dt: datetime) -> str:
+    # No "Z"/fraction suffix: "YYYY-MM-DDTHH:MM:SS" sorts just below every
+    # stored form of that second ("...:SSZ" and "...:SS.ffffffZ" alike)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
 def today_attempt_stats(conn: Connection, user_id: int = 1) -> dict:
+    # attempted_at is stored as UTC ISO-8601 text: bound the local day as a
+    # [start, end) UTC range so the (user_id, attempted_at) index does the
+    # work, instead of evaluating date(attempted_at) on every row. Each
+    # midnight is localized on its own, so DST-change days get 23/25 hours.
+    today = date.today()
+    start = datetime.combine(today, time()).astimezone()
+    end = datetime.combine(today + timedelta(days=1), time()).astimezone()
     sql = """
       SELECT
-        SUM(CASE WHEN date(attempted_at) = date('now','localtime') THEN 1 ELSE 0 END) AS attempts_today,
-        SUM(CASE WHEN date(attempted_at) = date('now','localtime') AND lower(result)='win'  THEN 1 ELSE 0 END) AS wins_today,
-        SUM(CASE WHEN date(attempted_at) = date('now','localtime') AND lower(result)='loss' THEN 1 ELSE 0 END) AS losses_today
+        COUNT(*) AS attempts_today,
+        SUM(CASE WHEN result='win'  THEN 1 ELSE 0 END) AS wins_today,
+        SUM(CASE WHEN result='loss' THEN 1 ELSE 0 END) AS losses_today
       FROM attempts
-      WHERE user_id = ?
+      WHERE user_id = ? AND attempted_at >= ? AND attempted_at < ?
     """
-    row = conn.execute(sql, (user_id,)).fetchone()
+    row = conn.execute(sql, (user_id, _utc_bound(start), _utc_bound(end))).fetchone()
     attempts = int(row[0] or 0)
     wins = int(row[1] or 0)
     losses = int(row[2] or 0)
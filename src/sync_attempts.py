@@ -15,6 +15,12 @@ from urllib3.util.retry import Retry
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
+try:
+    import orjson   # listed in requirements.txt; parses the raw line bytes in C
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads   # also takes bytes
+
 API = "https://lichess.org/api/puzzle/activity"  # NDJSON stream
 
 # ---------- env knobs ----------
@@ -72,20 +78,30 @@ def _ensure_user(engine: Engine, username: str) -> int:
         )
     return 1
 
-def _upsert_attempt(engine: Engine, user_id: int, pid: str, when_iso: str, win: bool):
-    # Matches your schema: unique (user_id, puzzle_id, attempted_at)
-    # time_ms and puzzle_rating_after unknown here -> NULL
-    with engine.begin() as conn:
-        conn.exec_driver_sql(
-            """
-            INSERT OR IGNORE INTO attempts(user_id, puzzle_id, attempted_at, result, time_ms, puzzle_rating_after)
-            VALUES (?, ?, ?, ?, NULL, NULL)
-            """,
-            (user_id, pid, when_iso, "win" if win else "loss"),
-        )
+# Matches your schema: unique (user_id, puzzle_id, attempted_at)
+# time_ms and puzzle_rating_after unknown here -> NULL
+UPSERT = text("""
+INSERT OR IGNORE INTO attempts(user_id, puzzle_id, attempted_at, result, time_ms, puzzle_rating_after)
+VALUES (:uid, :pid, :ts, :res, NULL, NULL)
+""")
+
+BATCH = 1000   # attempts per transaction (one commit/fsync per batch, not per row)
 
 # ---------- core fetch ----------
-def _fetch_and_upsert(engine: Engine, headers: dict[str, str], since_ms: int | None) -> tuple[int, int | None, set[str]]:
+READ_CHUNK = 64 * 1024   # bytes per read off the (decoded) response stream
+
+def _ndjson_lines(r: requests.Response) -> t.Iterator[bytes]:
+    """Non-empty NDJSON lines from 64 KB reads, carrying the partial tail line over."""
+    tail = b""
+    for chunk in r.iter_content(chunk_size=READ_CHUNK):
+        *lines, tail = (tail + chunk).split(b"\n")
+        for line in lines:
+            if line:
+                yield line
+    if tail:
+        yield tail
+
+def _fetch_and_upsert(engine: Engine, s: requests.Session, headers: dict[str, str], since_ms: int | None) -> tuple[int, int | None, set[str]]:
     """
     Returns: (inserted_count, latest_ms_seen, changed_puzzle_ids)
     """
@@ -96,18 +112,23 @@ def _fetch_and_upsert(engine: Engine, headers: dict[str, str], since_ms: int | N
     inserted = 0
     latest_ms = since_ms or 0
 
-    s = _session_with_retries()
+    batch: list[dict] = []
+
+    def flush():
+        if not batch:
+            return
+        with engine.begin() as conn:
+            conn.execute(UPSERT, batch)
+        batch.clear()
 
     try:
         with s.get(API, headers=headers, params=params, stream=True, timeout=ATTEMPTS_TIMEOUT) as r:
             r.raise_for_status()
-            # stream in modest chunks: iterate line by line
-            for line in r.iter_lines(decode_unicode=True, chunk_size=1024):
-                if not line:
-                    continue
+            # stream in 64 KB reads, split into lines ourselves (raw bytes, no decode pass)
+            for line in _ndjson_lines(r):
                 try:
-                    obj = json.loads(line)
-                except json.JSONDecodeError:
+                    obj = _loads(line)
+                except json.JSONDecodeError:   # orjson.JSONDecodeError subclasses it
                     continue
 
                 ms = int(obj.get("date", 0))  # ms since epoch
@@ -122,14 +143,17 @@ def _fetch_and_upsert(engine: Engine, headers: dict[str, str], since_ms: int | N
                 win = bool(obj.get("win", False))
 
                 when_iso = _iso_from_ms(ms)
-                _upsert_attempt(engine, 1, pid, when_iso, win)
+                batch.append({"uid": 1, "pid": pid, "ts": when_iso, "res": "win" if win else "loss"})
+                if len(batch) >= BATCH:
+                    flush()
                 inserted += 1
                 changed.add(pid)
                 if ms > latest_ms:
                     latest_ms = ms
-
     finally:
-        s.close()
+        # commit what was accepted however the loop ends (broken stream, bad
+        # record, Ctrl-C), as the per-row commits did
+        flush()
 
     return inserted, (latest_ms if inserted > 0 else since_ms), changed
 
@@ -145,34 +169,40 @@ def run(username: str, token: str, engine: Engine) -> None:
     # find last seen attempt timestamp to skip ancient rows faster (still safe due to UNIQUE)
     last_ms = _get_last_attempt_ms(engine)
 
-    # Outer guard: if even the retrying Session fails, do a small manual retry loop
+    # Outer guard: if even the retrying Session fails, do a small manual retry loop.
+    # One Session (and its pooled keep-alive connection) serves every attempt,
+    # so a retry doesn't redo the TCP/TLS handshake when the socket survived.
+    s = _session_with_retries()
     tries = 0
     inserted_total = 0
     changed_pids_total: set[str] = set()
-    while True:
-        tries += 1
-        try:
-            ins, latest, changed = _fetch_and_upsert(engine, headers, last_ms)
-            inserted_total += ins
-            changed_pids_total |= changed
-            # If nothing new, we’re done
-            print(f"[sync_attempts] Upserted {ins} attempts.")
-            break
-        except requests.exceptions.RequestException as e:
-            # Automatic retries were exhausted; do a short manual pause then try again
-            if tries <= 3:
-                wait = ATTEMPTS_RETRY_WAIT
-                print(f"[sync_attempts] Network error: {e!r}. Retrying in {wait}s...", flush=True)
-                try:
-                    time.sleep(wait)
-                    continue
-                except KeyboardInterrupt:
-                    raise
-            else:
-                print(f"[sync_attempts] Giving up after {tries} tries: {e!r}", file=sys.stderr, flush=True)
+    try:
+        while True:
+            tries += 1
+            try:
+                ins, latest, changed = _fetch_and_upsert(engine, s, headers, last_ms)
+                inserted_total += ins
+                changed_pids_total |= changed
+                # If nothing new, we’re done
+                print(f"[sync_attempts] Upserted {ins} attempts.")
                 break
-        except KeyboardInterrupt:
-            # Let Ctrl-C abort immediately
-            raise
+            except requests.exceptions.RequestException as e:
+                # Automatic retries were exhausted; do a short manual pause then try again
+                if tries <= 3:
+                    wait = ATTEMPTS_RETRY_WAIT
+                    print(f"[sync_attempts] Network error: {e!r}. Retrying in {wait}s...", flush=True)
+                    try:
+                        time.sleep(wait)
+                        continue
+                    except KeyboardInterrupt:
+                        raise
+                else:
+                    print(f"[sync_attempts] Giving up after {tries} tries: {e!r}", file=sys.stderr, flush=True)
+                    break
+            except KeyboardInterrupt:
+                # Let Ctrl-C abort immediately
+                raise
+    finally:
+        s.close()
 
     # Nothing else to do here; compute_srs will read attempts normally
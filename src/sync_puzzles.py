@@ -1,14 +1,19 @@
 import io
 import os
-import csv
+import queue
+import threading
 import requests
 import zstandard as zstd
+import pandas as pd
 from urllib.parse import urlparse, unquote
-from sqlalchemy import text
 
-UPSERT = text("""
+# Positional (?) form for sqlite3's executemany on the raw connection: no
+# SQLAlchemy bind processing per row. Re-pulled dumps are almost entirely
+# unchanged, so the DO UPDATE only fires when some column actually differs;
+# identical rows are left untouched (no page write, no rowcount).
+UPSERT = """
 INSERT INTO puzzles (puzzle_id, rating, rating_deviation, popularity, nb_plays, themes, game_url, fen, moves)
-VALUES (:id,:rating,:rd,:pop,:nb,:themes,:url,:fen,:moves)
+VALUES (?,?,?,?,?,?,?,?,?)
 ON CONFLICT(puzzle_id) DO UPDATE SET
   rating=excluded.rating,
   rating_deviation=excluded.rating_deviation,
@@ -18,7 +23,11 @@ ON CONFLICT(puzzle_id) DO UPDATE SET
   game_url=excluded.game_url,
   fen=excluded.fen,
   moves=excluded.moves
-""")
+WHERE (puzzles.rating, puzzles.rating_deviation, puzzles.popularity, puzzles.nb_plays,
+       puzzles.themes, puzzles.game_url, puzzles.fen, puzzles.moves)
+   IS NOT (excluded.rating, excluded.rating_deviation, excluded.popularity, excluded.nb_plays,
+           excluded.themes, excluded.game_url, excluded.fen, excluded.moves)
+"""
 
 def _open_stream(url: str):
     parsed = urlparse(url)
@@ -33,63 +42,174 @@ def _open_stream(url: str):
         return io.TextIOWrapper(dctx.stream_reader(r.raw), encoding="utf-8", newline="")
     raise ValueError(f"Unsupported URL scheme: {url}")
 
-def _get(row, *names, default=None):
-    for n in names:
-        if n in row and row[n] != "":
-            return row[n]
-    return default
+# Output fields in UPSERT order: (accepted CSV header names, default when the
+# column is missing or empty, strip whitespace). The first present non-empty
+# alias wins; stripping happens after that choice, a whole column at a time.
+FIELDS = (
+    (("id", "PuzzleId"), None, False),            # TEXT id
+    (("rating", "Rating"), None, False),
+    (("rd", "RatingDeviation"), 0, False),
+    (("popularity", "Popularity"), 0, False),
+    (("nbPlays", "NbPlays"), 0, False),
+    (("themes", "Themes"), "", True),
+    (("gameUrl", "GameUrl"), "", True),
+    (("FEN",), None, True),
+    (("moves", "Moves"), None, True),
+)
+
+CHUNK_ROWS = 50_000   # CSV rows parsed per pandas chunk
+BULK_CACHE_KIB = -262144   # page cache during the load (negative = KiB, i.e. 256 MB)
+
+def _columns(df: pd.DataFrame) -> list:
+    """One value sequence per FIELDS entry, aliases and defaults resolved per chunk."""
+    cols = []
+    for names, default, strip in FIELDS:
+        present = [n for n in names if n in df.columns]
+        if not present:
+            cols.append([default] * len(df))
+            continue
+        col = df[present[0]]
+        for n in present[1:]:
+            col = col.where(col != "", df[n])
+        if default != "":
+            col = col.where(col != "", default)
+        cols.append(col.str.strip() if strip else col)   # None (missing) stays None
+    return cols
+
+def _rows(stream):
+    """Yield CSV rows as FIELDS-ordered tuples, parsed in C by pandas one chunk at a time.
+
+    Everything stays a string (empty fields as "") so the per-field
+    defaults/casts below behave exactly as they did with csv.DictReader.
+    """
+    chunks = pd.read_csv(stream, dtype=str, keep_default_na=False, na_filter=False, chunksize=CHUNK_ROWS)
+    for i, df in enumerate(chunks):
+        if i == 0:
+            fieldnames = list(df.columns)
+            print(f"[sync_puzzles] CSV columns: {fieldnames[:10]}{'...' if len(fieldnames)>10 else ''}")
+        yield from zip(*_columns(df))
+
+SECONDARY_INDEXES = "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name='puzzles' AND sql IS NOT NULL"
+
+def _restore_indexes(cur, indexes):
+    """Recreate whichever of the captured puzzles indexes are missing, then refresh stats."""
+    present = {r[0] for r in cur.execute(SECONDARY_INDEXES)}
+    missing = [(name, sql) for name, sql in indexes if name not in present]
+    for _, sql in missing:
+        cur.execute(sql)
+    if missing:
+        cur.execute("ANALYZE puzzles")
 
 def run(url: str, engine):
     reader = _open_stream(url)
-    dr = csv.DictReader(reader)
 
-    fieldnames = dr.fieldnames or []
-    print(f"[sync_puzzles] CSV columns: {fieldnames[:10]}{'...' if len(fieldnames)>10 else ''}")
-
-    batch, BATCH = [], 5000
+    BATCH = 5000
+    PIPELINE_DEPTH = 4   # parsed batches buffered ahead of the writer
+    COMMIT_EVERY = 10   # batches per transaction: caps WAL growth, one commit per 50k rows
     total = 0
+    written = 0   # rows inserted or actually changed
     skipped = 0
+    flushes = 0
 
-    def flush():
-        nonlocal batch, total
-        if not batch:
-            return
-        with engine.begin() as conn:
-            conn.execute(UPSERT, batch)
-        total += len(batch)
-        batch.clear()
-        print(f"[sync_puzzles] Upserted {total:,} rows...", end="\r")
+    # Writes go through the raw sqlite3 connection behind the engine (PRAGMAs
+    # from the connect hook still apply); sqlite3 opens the transaction itself.
+    raw = engine.raw_connection()
+    cur = raw.cursor()
+    # WAL/synchronous/temp_store/mmap already come from db.PRAGMAS. The bulk
+    # load only widens the page cache (256 MB) so index pages of the 4M-row
+    # table stay resident; it is put back before the connection is pooled.
+    # (No locking_mode=EXCLUSIVE: serve.py may be reading meanwhile.)
+    prev_cache = cur.execute("PRAGMA cache_size").fetchone()[0]
+    cur.execute(f"PRAGMA cache_size={BULK_CACHE_KIB}")
+    # Secondary indexes (not the puzzle_id key the upsert needs) are dropped
+    # for the load and rebuilt afterwards in one sorted pass per index.
+    indexes = cur.execute(SECONDARY_INDEXES).fetchall()
+
+    # Decompress + parse runs on a producer thread and hands BATCH-sized lists
+    # to this thread, which only writes: zstd, the pandas CSV parser and
+    # sqlite3 all release the GIL, so parsing the next chunk overlaps the
+    # current executemany. The bounded queue keeps memory flat when the
+    # writer is the slower side. None marks the end of the stream.
+    batches = queue.Queue(maxsize=PIPELINE_DEPTH)
+    stop = threading.Event()
+    failure = []
 
-    for row in dr:
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        nonlocal skipped
+        batch = []
         try:
-            pid = _get(row, "id", "PuzzleId")            # TEXT id
-            rating = _get(row, "rating", "Rating")
-            rd = _get(row, "rd", "RatingDeviation", default=0)
-            pop = _get(row, "popularity", "Popularity", default=0)
-            nbp = _get(row, "nbPlays", "NbPlays", default=0)
-            themes = _get(row, "themes", "Themes", default="") or ""
-            url_ = _get(row, "gameUrl", "GameUrl", default="") or ""
-            fen = _get(row, "FEN", default=None)
-            moves = _get(row, "moves", "Moves", default=None)
-
-            rec = {
-                "id": str(pid),
-                "rating": int(rating),
-                "rd": int(rd or 0),
-                "pop": int(pop or 0),
-                "nb": int(nbp or 0),
-                "themes": themes.strip(),
-                "url": url_.strip(),
-                "fen": fen.strip(),
-                "moves": moves.strip(),
-            }
-        except Exception:
-            skipped += 1
-            continue
+            for row in _rows(reader):
+                try:
+                    pid, rating, rd, pop, nbp, themes, url_, fen, moves = row
+                    if fen is None or moves is None:
+                        raise ValueError("missing FEN/moves")
+                    rec = (
+                        str(pid),
+                        int(rating),
+                        int(rd or 0),
+                        int(pop or 0),
+                        int(nbp or 0),
+                        themes,
+                        url_,
+                        fen,
+                        moves,
+                    )
+                except Exception:
+                    skipped += 1
+                    continue
 
-        batch.append(rec)
-        if len(batch) >= BATCH:
-            flush()
+                batch.append(rec)
+                if len(batch) >= BATCH:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            put(None)
 
-    flush()
-    print(f"\n[sync_puzzles] Done. Total upserted: {total:,}. Skipped: {skipped:,}.")
+    def flush(batch):
+        nonlocal total, written, flushes
+        cur.executemany(UPSERT, batch)
+        written += cur.rowcount
+        total += len(batch)
+        flushes += 1
+        if flushes % COMMIT_EVERY == 0:
+            raw.commit()
+        print(f"[sync_puzzles] Upserted {total:,} rows...", end="\r")
+
+    producer = threading.Thread(target=produce, name="sync_puzzles-parse", daemon=True)
+    try:
+        for name, _ in indexes:
+            cur.execute(f'DROP INDEX IF EXISTS "{name}"')
+        producer.start()
+        while (batch := batches.get()) is not None:
+            flush(batch)
+        if failure:
+            raise failure[0]
+        raw.commit()
+    except BaseException:
+        raw.rollback()   # only the open (uncommitted) batches are lost
+        raise
+    finally:
+        stop.set()   # unblocks a producer still waiting on a full queue
+        if producer.ident is not None:
+            producer.join()
+        reader.close()
+        try:
+            _restore_indexes(cur, indexes)
+            cur.execute(f"PRAGMA cache_size={prev_cache}")
+        finally:
+            raw.close()  # returns the connection to the pool
+    print(f"\n[sync_puzzles] Done. Total upserted: {total:,} ({written:,} new/changed). Skipped: {skipped:,}.")
@@ -5,7 +5,7 @@ from pathlib import Path
 
 HERE = Path(__file__).resolve()
 sys.path.insert(0, str(HERE.parent))          # add .../Chess/src
-sys.path.insert(0, str(HERE.parent.parent))   # add .../Chess (so `import db` works)
+sys.path.insert(0, str(HERE.parent.parent))   # add .../Chess (so `import src.db` works)
 # --------------------------------------------------------------------------
 
 # Orchestrator: init DB -> sync puzzles -> sync attempts -> compute SRS -> render report
@@ -33,7 +33,7 @@ def backup_db(db_path: str, backups_dir: str = "backups"):
             print(f"[backup] rotate WARN: {e}")
 
 # local modules
-from db import init_db, get_engine
+from src.db import init_db, get_engine
 
 # ---------- tiny .env loader (no dependency on python-dotenv) ----------
 def load_dotenv(path: str | os.PathLike = ".env") -> None:
@@ -94,7 +94,7 @@ def main() -> None:
     # 3) SRS
     print("==> Computing SRS", flush=True)
     try:
-        compute_srs(eng)
+        compute_srs(eng, bulk=True)
     except TypeError:
         # older version that takes no args
         compute_srs()